@@ -0,0 +1,94 @@
+"""
+Benchmark of the candidate generators used by the SpellChecker: the EditDistTrie, the
+ShardedEditDistTrie (used when many_texts=True) and the SymSpellIndex. Uses the lexicons in psynlp/resources/lexicons (without the spacy single
+token check and without the frequent tokens), and queries that are generated by making
+one or two random substitutions in words from the lexicon.
+
+Usage:
+    python benchmarks/benchmark_candidate_generators.py [num_queries]
+"""
+
+import glob
+import os
+import random
+import sys
+import time
+
+import unidecode
+
+from psynlp.spelling.editdisttrie import EditDistTrie, ShardedEditDistTrie
+from psynlp.spelling.symspell import SymSpellIndex
+from psynlp.utils import get_local_resource
+
+
+def read_lexicon():
+
+    lexicon = set([])
+
+    for path in glob.glob(os.path.join(get_local_resource('lexicons'), '*.txt')):
+
+        with open(path, 'r') as file:
+            words = file.read().split("\n")
+
+        lexicon.update(unidecode.unidecode(word.lower()) for word in words if len(word) > 0)
+
+    return lexicon
+
+
+def generate_queries(lexicon, num_queries, seed=0):
+
+    rng = random.Random(seed)
+    queries = []
+
+    for word in rng.sample(sorted(lexicon), num_queries):
+        for _ in range(rng.randint(1, 2)):
+            i = rng.randrange(len(word))
+            word = word[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + word[i + 1:]
+        queries.append(word)
+
+    return queries
+
+
+def max_edit_distance(query):
+    # Same as SpellChecker._search_matches
+    return 1 if len(query) <= 3 else 2
+
+
+def timed(func, *args):
+
+    start = time.perf_counter()
+    result = func(*args)
+
+    return result, time.perf_counter() - start
+
+
+def main(num_queries=500):
+
+    lexicon = read_lexicon()
+    queries = generate_queries(lexicon, num_queries)
+
+    print("Lexicon size = {}, number of queries = {}".format(len(lexicon), len(queries)))
+
+    results = {}
+
+    generator_classes = [('EditDistTrie', EditDistTrie),
+                         ('ShardedEditDistTrie', ShardedEditDistTrie),
+                         ('SymSpellIndex', SymSpellIndex)]
+
+    for name, generator_class in generator_classes:
+
+        generator, build_time = timed(generator_class, lexicon)
+
+        results[name], search_time = timed(
+            lambda: [generator.search_matches(query, max_edit_distance(query)) for query in queries])
+
+        print("> {:<20} build = {:6.2f}s, search = {:8.2f}ms/query".format(
+            name, build_time, 1000 * search_time / len(queries)))
+
+    print("> Identical results: {}".format(
+        results['EditDistTrie'] == results['ShardedEditDistTrie'] == results['SymSpellIndex']))
+
+
+if __name__ == '__main__':
+    # The ShardedEditDistTrie builds its tries in a multiprocessing pool
+    main(*[int(arg) for arg in sys.argv[1:]])
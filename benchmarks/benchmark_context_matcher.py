@@ -0,0 +1,145 @@
+"""
+Benchmark of matching the context of entities in many sentences: calling
+ContextMatcher.match_context for each sentence (as with DataFrame.apply), against
+ContextMatcher.match_context_many with different batch sizes and numbers of processes. Also
+compares the 'mask' and 'interval' scope engines on long texts (many sentences that are not
+split). The sentences are generated from the preconfigured triggers, some filler words and a few
+entity phrases. Also checks that all of these result in exactly the same context for each entity.
+
+Usage:
+    python benchmarks/benchmark_context_matcher.py spacy_model [num_sentences] [n_process]
+
+where spacy_model is the name of a spacy model in the global resource folder.
+"""
+
+import random
+import sys
+import time
+
+from psynlp.context import ContextMatcher
+from psynlp.context.triggers import experiencer_triggers, negation_triggers, plausibility_triggers, \
+    temporality_triggers
+from psynlp.entity import BasicEntityMatcher
+
+ENTITY_PHRASES = {'symptomen': ['somber', 'boos', 'angstig', 'suicidaal'],
+                  'diagnoses': ['depressie', 'psychose', 'adhd']}
+
+FILLER_WORDS = ['patient', 'heeft', 'is', 'en', 'de', 'het', 'een', 'met', 'klachten', 'wel', 'goed',
+                'vandaag', 'op', 'afdeling', '.', ',']
+
+
+def generate_sentences(num_sentences, seed=0):
+
+    rng = random.Random(seed)
+
+    phrases = [phrase for triggers in [experiencer_triggers, negation_triggers, plausibility_triggers,
+                                       temporality_triggers]
+               for ((_, rule_type, _), trigger_list) in triggers.items() if rule_type == 'phrase'
+               for phrase in trigger_list]
+
+    entity_words = [phrase for phrase_list in ENTITY_PHRASES.values() for phrase in phrase_list]
+
+    sentences = []
+
+    for _ in range(num_sentences):
+
+        words = []
+
+        for _ in range(rng.randint(3, 25)):
+
+            r = rng.random()
+
+            if r < 0.2:
+                words.append(rng.choice(phrases))
+            elif r < 0.35:
+                words.append(rng.choice(entity_words))
+            else:
+                words.append(rng.choice(FILLER_WORDS))
+
+        sentences.append(" ".join(words))
+
+    return sentences
+
+
+def contexts(entity_lists):
+    return [[entity.context for entity in entities] for entities in entity_lists]
+
+
+def benchmark_long_texts(spacy_model, entity_matcher, sentences, sentences_per_text):
+
+    texts = [" ".join(sentences[i:i + sentences_per_text])
+             for i in range(0, len(sentences), sentences_per_text)]
+
+    print("Long texts: {} of {} sentences".format(len(texts), sentences_per_text))
+
+    reference = None
+
+    for scope_engine in ['mask', 'interval']:
+
+        context_matcher = ContextMatcher(spacy_model, scope_engine=scope_engine)
+
+        # Only resolving the scopes (and labeling the entities) is timed
+        docs = [context_matcher._tokenize(text) for text in texts]
+        entity_lists = [entity_matcher.extract_entities(doc) for doc in docs]
+
+        seconds = 0
+
+        for doc, entities in zip(docs, entity_lists):
+
+            context_matcher._match_triggers_in_docs([doc])
+
+            start = time.perf_counter()
+            context_matcher._process_matches([entities])
+            seconds += time.perf_counter() - start
+
+        if reference is None:
+            reference = contexts(entity_lists)
+
+        print("{:<40} {:>10.2f} ms/text  identical: {}".format(
+            "scope_engine='{}'".format(scope_engine), 1000 * seconds / len(texts),
+            contexts(entity_lists) == reference))
+
+
+def main(spacy_model, num_sentences=20000, n_process=2):
+
+    context_matcher = ContextMatcher(spacy_model)
+    entity_matcher = BasicEntityMatcher(ENTITY_PHRASES, spacy_model)
+
+    sentences = generate_sentences(num_sentences)
+
+    print("Sentences: {}".format(len(sentences)))
+
+    # Per sentence
+    entity_lists = [entity_matcher.extract_entities(sentence) for sentence in sentences]
+
+    start = time.perf_counter()
+
+    for sentence, entities in zip(sentences, entity_lists):
+        context_matcher.match_context(sentence, entities)
+
+    seconds = time.perf_counter() - start
+    reference = contexts(entity_lists)
+
+    print("{:<40} {:>10.0f} sentences/s".format("match_context", len(sentences) / seconds))
+
+    # In batches
+    for batch_size, num_processes in [(100, 1), (1000, 1), (1000, n_process)]:
+
+        entity_lists = [entity_matcher.extract_entities(sentence) for sentence in sentences]
+
+        start = time.perf_counter()
+        context_matcher.match_context_many(sentences, entity_lists, batch_size=batch_size,
+                                           n_process=num_processes)
+        seconds = time.perf_counter() - start
+
+        print("{:<40} {:>10.0f} sentences/s  identical: {}".format(
+            "match_context_many ({}, {} process(es))".format(batch_size, num_processes),
+            len(sentences) / seconds, contexts(entity_lists) == reference))
+
+    # Long texts
+    for sentences_per_text in [100, 1000]:
+        benchmark_long_texts(spacy_model, entity_matcher, sentences, sentences_per_text)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], *[int(arg) for arg in sys.argv[2:]])
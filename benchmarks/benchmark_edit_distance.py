@@ -0,0 +1,135 @@
+"""
+Micro-benchmarks of the edit distance functions: the bit-parallel functions in
+psynlp.spelling.editdistance against nltk.edit_distance (previously used by the NoisyRanker for
+phonetic distances) and the dynamic programming bounded_edit_distance (previously used to verify
+symspell and phonetic candidates). Uses pairs of words from the lexicons in
+psynlp/resources/lexicons, where the second word is obtained by one or two random edits, and
+the double metaphone codes of these pairs.
+
+Usage:
+    python benchmarks/benchmark_edit_distance.py [num_pairs]
+"""
+
+import glob
+import os
+import random
+import sys
+import time
+
+from doublemetaphone import doublemetaphone
+from nltk import edit_distance as nltk_edit_distance
+
+from psynlp.spelling.editdistance import bounded_edit_distance, edit_distance, edit_distances
+from psynlp.utils import get_local_resource
+
+
+def dp_bounded_edit_distance(word_1, word_2, max_distance):
+    # The previous implementation of bounded_edit_distance
+
+    previous_row = list(range(len(word_2) + 1))
+
+    for i, letter_1 in enumerate(word_1, start=1):
+
+        current_row = [i]
+
+        for j, letter_2 in enumerate(word_2, start=1):
+            current_row.append(min(current_row[j - 1] + 1,
+                                   previous_row[j] + 1,
+                                   previous_row[j - 1] + (letter_1 != letter_2)))
+
+        if min(current_row) > max_distance:
+            return max_distance + 1
+
+        previous_row = current_row
+
+    return previous_row[-1]
+
+
+def read_words():
+
+    words = set([])
+
+    for path in glob.glob(os.path.join(get_local_resource('lexicons'), '*.txt')):
+
+        with open(path, 'r') as file:
+            words.update(word.lower() for word in file.read().split("\n") if len(word) > 0)
+
+    return sorted(words)
+
+
+def generate_pairs(words, num_pairs, seed=0):
+
+    rng = random.Random(seed)
+    pairs = []
+
+    for word in rng.sample(words, num_pairs):
+
+        edited_word = word
+
+        for _ in range(rng.randint(1, 2)):
+            i = rng.randrange(len(edited_word) + 1)
+            edited_word = edited_word[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + edited_word[i + 1:]
+
+        pairs.append((word, edited_word))
+
+    return pairs
+
+
+def timed(func):
+
+    start = time.perf_counter()
+    result = func()
+
+    return result, time.perf_counter() - start
+
+
+def report(name, pairs, reference, functions):
+
+    print("{} ({} pairs)".format(name, len(pairs)))
+
+    for function_name, function in functions:
+
+        result, seconds = timed(function)
+
+        print("> {:<45} {:8.2f}us/pair  identical: {}".format(
+            function_name, 1e6 * seconds / len(pairs), result == reference))
+
+
+def main(num_pairs=20000):
+
+    pairs = generate_pairs(read_words(), num_pairs)
+    code_pairs = [(doublemetaphone(word_1)[0], doublemetaphone(word_2)[0]) for (word_1, word_2) in pairs]
+
+    # Unbounded distances of phonetic codes, as in the NoisyRanker
+    reference = [nltk_edit_distance(code_1, code_2) for (code_1, code_2) in code_pairs]
+
+    report("Phonetic codes, unbounded", code_pairs, reference, [
+        ("nltk.edit_distance", lambda: [nltk_edit_distance(code_1, code_2) for (code_1, code_2) in code_pairs]),
+        ("edit_distance", lambda: [edit_distance(code_1, code_2) for (code_1, code_2) in code_pairs]),
+    ])
+
+    # Bounded distances of words, as when verifying candidates
+    for max_distance in [1, 2, 3]:
+
+        reference = [dp_bounded_edit_distance(word_1, word_2, max_distance) for (word_1, word_2) in pairs]
+
+        report("Words, max_distance={}".format(max_distance), pairs, reference, [
+            ("dynamic programming bounded_edit_distance",
+             lambda: [dp_bounded_edit_distance(word_1, word_2, max_distance) for (word_1, word_2) in pairs]),
+            ("bounded_edit_distance",
+             lambda: [bounded_edit_distance(word_1, word_2, max_distance) for (word_1, word_2) in pairs]),
+        ])
+
+    # One query and many candidates, as for the candidates of a misspelling
+    query = pairs[0][1]
+    candidates = [word for (word, _) in pairs]
+    reference = [dp_bounded_edit_distance(query, candidate, 2) for candidate in candidates]
+
+    report("One query, many candidates, max_distance=2", candidates, reference, [
+        ("bounded_edit_distance", lambda: [bounded_edit_distance(query, candidate, 2) for candidate in candidates]),
+        ("edit_distances", lambda: edit_distances(query, candidates, 2)),
+    ])
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,98 @@
+"""
+Benchmark of building the lexicon from the lexicons in psynlp/resources/lexicons: checking each
+word with a separate spacy call (as the SpellChecker did before), against the LexiconBuilder
+with a single process, with multiple processes, and with a cache. Also checks that all of these
+result in exactly the same lexicon.
+
+Usage:
+    python benchmarks/benchmark_lexicon.py spacy_model [num_words]
+
+where spacy_model is the name of a spacy model in the global resource folder, and num_words
+optionally limits the number of words of each lexicon file.
+"""
+
+import glob
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import spacy
+import unidecode
+
+from psynlp.spelling.lexicon import LexiconBuilder
+from psynlp.utils import get_global_resource, get_local_resource
+
+
+def read_vocabularies(num_words=None):
+
+    vocabularies = []
+
+    for path in glob.glob(os.path.join(get_local_resource('lexicons'), '*.txt')):
+
+        with open(path, 'r') as file:
+            vocabularies.append(file.read().split("\n")[:num_words])
+
+    return vocabularies
+
+
+def lexicon_per_word(nlp, vocabularies):
+    # The previous implementation of SpellChecker._add_vocab_to_lexicon
+
+    lexicon = set([])
+
+    for vocabulary_list in vocabularies:
+        for word in vocabulary_list:
+            if (len(word) > 0) and len(nlp(word, disable=['tagger', 'parser', 'ner'])) == 1:
+                lexicon.add(unidecode.unidecode(word.lower()))
+
+    return lexicon
+
+
+def lexicon_bulk(lexicon_builder, vocabularies):
+
+    lexicon = set([])
+
+    for vocabulary_list in vocabularies:
+        lexicon.update(lexicon_builder.lexicon_words(vocabulary_list))
+
+    return lexicon
+
+
+def timed(func, *args):
+
+    start = time.perf_counter()
+    result = func(*args)
+
+    return result, time.perf_counter() - start
+
+
+def main(spacy_model, num_words=None):
+
+    nlp = spacy.load(get_global_resource(os.path.join('spacy', spacy_model)))
+    vocabularies = read_vocabularies(num_words)
+
+    print("Words: {}".format(sum(len(vocabulary_list) for vocabulary_list in vocabularies)))
+
+    reference, seconds = timed(lexicon_per_word, nlp, vocabularies)
+    print("{:<30} {:>8.2f}s  lexicon size {}".format("per word", seconds, len(reference)))
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+
+        configurations = [
+            ("bulk, 1 process", LexiconBuilder(nlp, n_jobs=1)),
+            ("bulk, {} processes".format(multiprocessing.cpu_count()), LexiconBuilder(nlp, n_jobs=None)),
+            ("bulk, cache (cold)", LexiconBuilder(nlp, cache_dir=cache_dir, n_jobs=None)),
+            ("bulk, cache (warm)", LexiconBuilder(nlp, cache_dir=cache_dir, n_jobs=None)),
+        ]
+
+        for name, lexicon_builder in configurations:
+
+            lexicon, seconds = timed(lexicon_bulk, lexicon_builder, vocabularies)
+
+            print("{:<30} {:>8.2f}s  identical: {}".format(name, seconds, lexicon == reference))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else None)
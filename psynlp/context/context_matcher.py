@@ -1,12 +1,16 @@
 import numpy as np
 
+from bisect import bisect_left, bisect_right
+from collections import deque
 from itertools import chain
 
 import spacy
 
 from spacy.matcher import Matcher
 from spacy.matcher import PhraseMatcher
+from spacy.tokens import Doc
 
+from psynlp.context.intervals import covers, merge_intervals, subtract_intervals
 from psynlp.context.rule import Rule
 from psynlp.context.rule import MatchedRule
 
@@ -15,6 +19,7 @@ import re
 from psynlp.utils import get_global_resource
 
 KNOWN_CONTEXTS = ['experiencer', 'negation', 'plausibility', 'temporality']
+KNOWN_SCOPE_ENGINES = ['mask', 'interval']
 
 POSITION_TO_IND = {'preceding': 0,
                    'following': 1,
@@ -22,27 +27,64 @@ POSITION_TO_IND = {'preceding': 0,
                    'termination': 3
                    }
 
+# Token attributes of patterns that are not set by the tokenizer, and the pipeline components
+# that are needed to set them
+TAGGER_ATTRIBUTES = ['POS', 'TAG', 'MORPH', 'LEMMA']
+TAGGER_COMPONENTS = ['tok2vec', 'transformer', 'tagger', 'morphologizer', 'attribute_ruler', 'lemmatizer']
+
 
 class ContextMatcher:
     '''
     Detexts context of entities in text.
     '''
 
-    def __init__(self, spacy_model, add_preconfig_triggers=True):
+    def __init__(self, spacy_model, add_preconfig_triggers=True, tokenizer_only=False, scope_engine="mask"):
+        '''
+        Initialize by loading the spacy model, and adding the preconfigured triggers.
+
+        Arguments:
+            spacy_model (str) - The name of the spacy model in the global resource folder
+            add_preconfig_triggers (bool) - Whether to add the preconfigured contexts
+            tokenizer_only (bool) - Whether to only tokenize sentences, rather than also applying
+                the tagger and other components (except the parser and ner). If patterns use
+                POS, TAG, MORPH or LEMMA attributes (such as one of the preconfigured negation
+                triggers), the components that are needed for these are still applied.
+            scope_engine (str) - How the scopes of triggers are resolved, one of KNOWN_SCOPE_ENGINES:
+                'mask' fills a mask of all tokens, 'interval' uses sorted intervals of the triggers,
+                so that its cost depends on the number of triggers and entities rather than on the
+                number of tokens (which is faster for long texts)
+        '''
+
+        if scope_engine not in KNOWN_SCOPE_ENGINES:
+            raise NameError(
+                "Scope engine {} does not exist, choose from: {}".format(scope_engine, KNOWN_SCOPE_ENGINES))
 
         # Nlp (tokenizer)
         spacy_model_path = get_global_resource(
             'spacy/{}'.format(spacy_model))
         self._nlp = spacy.load(spacy_model_path)
 
+        self.tokenizer_only = tokenizer_only
+        self.scope_engine = scope_engine
+
+        # The attributes used by patterns that are set by the tagger, see TAGGER_ATTRIBUTES
+        self._tagger_attributes = set()
+
         # Init phrase matcher for matching phrases
         self.phrase_matcher = PhraseMatcher(self._nlp.vocab, attr="LOWER")
 
         # Init pattern matcher for matching spacy patterns
         self.pattern_matcher = Matcher(self._nlp.vocab, validate=True)
 
-        # Init empty dict of regexp patterns for matching regexps
+        # Init empty dict of regexp patterns for matching regexps, from rule_key to a list of
+        # regexps, the compiled regexps, and the single compiled regexp that finds the positions
+        # where any of them match (see _compile_regexp_triggers)
         self.trigger_regexps = {}
+        self._regexps = []
+        self._regexp_rule_keys = []
+        self._regexp_scanner = None
+        self._num_scanned_regexps = 0
+        self._regexp_group_to_index = {}
 
         # Dictionary from rule_keys to to rule. Will keep track of the rule that was triggered,
         # since the spacy matcher can only identify a rule using a string. Later on we can
@@ -56,9 +98,18 @@ class ContextMatcher:
         # Initially, there are no matches
         self._matched_rules = None
 
-        # Length of the sentence
+        # Length of the sentence (or the total length of a batch of sentences)
         self._sentence_length = None
 
+        # Index of the first token of each sentence of a batch, see match_context_many
+        self._segment_starts = None
+
+        # Buffers used to resolve the scope of triggers, see _get_buffers
+        self._token_mask_buffer = np.zeros((0, len(POSITION_TO_IND), 0), dtype=bool)
+        self._trigger_index_buffer = None
+        self._terminate_index_buffer = None
+        self._token_index = None
+
         # Add preconfig triggers
         if add_preconfig_triggers:
             self._add_preconfig_triggers()
@@ -154,17 +205,82 @@ class ContextMatcher:
 
                     self.pattern_matcher.add(rule_key, trigger_list)
 
+                    self._tagger_attributes.update(
+                        attribute.upper() for pattern in trigger_list for token_pattern in pattern
+                        for attribute in token_pattern if attribute.upper() in TAGGER_ATTRIBUTES)
+
                 # Regepxs (in a list)
                 elif rule_type == "regexp":
 
-                    for regexp in trigger_list:
-                        self.trigger_regexps[rule_key] = regexp
+                    self.trigger_regexps[rule_key] = list(trigger_list)
 
                 else:
                     raise NameError(
                         "Rule type {} does not exist".format(rule_type))
 
-    def _match_spacy_triggers(self, doc, matcher):
+        self._compile_regexp_triggers()
+
+    def _compile_regexp_triggers(self):
+        '''
+        Compile all regexps into a single scanner, so that a sentence is scanned only once to find
+        the positions where any regexp matches. The scanner is an alternation of lookaheads, with a
+        named group for each regexp, so that it finds every such position, also within the match of
+        another regexp. Identical regexps of different rules (for instance a preceding and a
+        following trigger) share a group.
+
+        At each position, the scanner only reports the first regexp that matches, the regexps after
+        it are then matched at that position separately (see _match_regexp_triggers). Each regexp
+        thus gives the same matches as scanning the sentence with that regexp alone, and matches of
+        different regexps (such as a pseudo trigger and the trigger it cancels) can overlap.
+
+        Regexps that cannot be part of the scanner, because they contain global inline flags or
+        group names that are also used by another regexp, are scanned separately instead. Regexps
+        should not contain numbered backreferences.
+        '''
+
+        regexp_to_rule_keys = {}
+
+        for rule_key, regexps in self.trigger_regexps.items():
+            for regexp in regexps:
+                regexp_to_rule_keys.setdefault(regexp, {})[rule_key] = None
+
+        scanned = []
+        separate = []
+        group_names = set()
+
+        for regexp, rule_keys in regexp_to_rule_keys.items():
+
+            compiled_regexp = re.compile(regexp)
+
+            # Global inline flags would apply to the entire scanner
+            if compiled_regexp.flags & ~re.UNICODE == 0 and \
+                    group_names.isdisjoint(compiled_regexp.groupindex):
+                group_names.update(compiled_regexp.groupindex)
+                scanned.append((regexp, compiled_regexp, list(rule_keys)))
+            else:
+                separate.append((regexp, compiled_regexp, list(rule_keys)))
+
+        alternatives = []
+
+        for i, (regexp, _, _) in enumerate(scanned):
+            alternatives.append("(?P<regexp_{}>{})".format(i, regexp))
+
+        try:
+            regexp_scanner = re.compile("(?=(?:{}))".format("|".join(alternatives))) \
+                if len(alternatives) > 0 else None
+        except re.error:
+            # For instance if a regexp uses a group name of the scanner, scan all separately
+            regexp_scanner = None
+            separate = scanned + separate
+            scanned = []
+
+        self._regexp_scanner = regexp_scanner
+        self._num_scanned_regexps = len(scanned)
+        self._regexps = [compiled_regexp for (_, compiled_regexp, _) in scanned + separate]
+        self._regexp_rule_keys = [rule_keys for (_, _, rule_keys) in scanned + separate]
+        self._regexp_group_to_index = {"regexp_{}".format(i): i for i in range(len(scanned))}
+
+    def _match_spacy_triggers(self, doc, matcher, token_offset=0):
 
         matches = matcher(doc)
 
@@ -177,35 +293,90 @@ class ContextMatcher:
             match_tokens = doc[token_start:token_end]
 
             # Create a MatchedRule object that will be further processed later
-            matched_rule = MatchedRule(token_start=token_start,
-                                       token_end=token_end,
+            matched_rule = MatchedRule(token_start=token_offset + token_start,
+                                       token_end=token_offset + token_end,
                                        level=rule.level,
                                        position=rule.position,
                                        text=match_tokens)
 
             self._matched_rules.append(matched_rule)
 
-    def _match_regexp_triggers(self, text, doc):
+    def _find_regexp_matches(self, text):
+        # The index and character span of each match of each regexp, see _compile_regexp_triggers
 
-        # Process regexps
-        for rule_key in self.trigger_regexps:
+        # The end of the last match of each regexp, since matches of the same regexp do not overlap
+        match_ends = [0] * self._num_scanned_regexps
 
-            # Obtain rule
-            rule = self._rule_key_to_rule[rule_key]
+        # Find all positions where a scanned regexp matches in a single scan
+        if self._regexp_scanner is not None:
+
+            for position_match in self._regexp_scanner.finditer(text):
+
+                position = position_match.start()
+                first_index = self._regexp_group_to_index[position_match.lastgroup]
+
+                for i in range(first_index, self._num_scanned_regexps):
+
+                    if position < match_ends[i]:
+                        continue
+
+                    # The regexps before the first one that matches do not match at this position
+                    if i == first_index:
+                        char_start, char_end = position_match.span(position_match.lastgroup)
+                    else:
+                        match = self._regexps[i].match(text, position)
+
+                        if match is None:
+                            continue
+
+                        char_start, char_end = match.span()
+
+                    match_ends[i] = char_end
+
+                    yield i, char_start, char_end
 
-            # Iterate over matches
-            for match in re.finditer(self.trigger_regexps[rule_key], text):
+        # The regexps that are not part of the scanner
+        for i in range(self._num_scanned_regexps, len(self._regexps)):
+            for match in self._regexps[i].finditer(text):
+                yield (i, ) + match.span()
 
-                # Determine span
-                char_start, char_end = match.span()
-                span = doc.char_span(char_start, char_end)  # todo beter fixen
+    def _match_regexp_triggers(self, text, doc, token_offset=0):
 
-                # If the span is not empty
-                if span is not None:
+        if len(self._regexps) == 0:
+            return
+
+        # Character offsets where each token starts and ends, only computed if there is a match
+        token_starts = None
+        token_ends = None
+
+        for i, char_start, char_end in self._find_regexp_matches(text):
+
+            # Empty matches (of regexps such as (niet)?) do not cover any token
+            if char_start == char_end:
+                continue
+
+            if token_starts is None:
+                token_starts = [token.idx for token in doc]
+                token_ends = [token.idx + len(token) for token in doc]
+
+            # Determine the tokens that overlap with the match, also when the match does not
+            # start or end at a token boundary
+            token_start = bisect_right(token_ends, char_start)
+            token_end = bisect_left(token_starts, char_end)
+
+            # If the span is not empty
+            if token_start < token_end:
+
+                span = doc[token_start:token_end]
+
+                for rule_key in self._regexp_rule_keys[i]:
+
+                    # Obtain rule
+                    rule = self._rule_key_to_rule[rule_key]
 
                     # Create a MatchedRule object that will be further processed later
-                    matched_rule = MatchedRule(token_start=span.start,
-                                               token_end=span.end,
+                    matched_rule = MatchedRule(token_start=token_offset + token_start,
+                                               token_end=token_offset + token_end,
                                                level=rule.level,
                                                position=rule.position,
                                                text=span
@@ -213,19 +384,74 @@ class ContextMatcher:
 
                     self._matched_rules.append(matched_rule)
 
+    def _disabled_components(self):
+        # The pipeline components that are not applied to sentences
+
+        if not self.tokenizer_only:
+            return ['parser', 'ner']
+
+        if len(self._tagger_attributes) > 0:
+            return [name for name in self._nlp.pipe_names if name not in TAGGER_COMPONENTS]
+
+        return list(self._nlp.pipe_names)
+
+    def _tokenize(self, text):
+        # Spacy tokenize a sentence. A sentence that is already tokenized is only tagged if the
+        # patterns use attributes that it does not have yet (for instance if it was only
+        # tokenized), since matching does not need any other annotations.
+
+        if isinstance(text, Doc):
+
+            doc = text
+
+            if all(doc.has_annotation(attribute) for attribute in self._tagger_attributes):
+                return doc
+
+            for name, component in self._nlp.pipeline:
+                if name in TAGGER_COMPONENTS:
+                    doc = component(doc)
+
+            return doc
+
+        return self._nlp(text, disable=self._disabled_components())
+
     def _match_triggers(self, text):
 
+        # Spacy tokenize document and find matches
+        doc = self._tokenize(text)
+
+        self._match_triggers_in_docs([doc])
+
+    def _match_triggers_in_docs(self, docs):
+
         # Initialize
         self._matched_rules = []
+        self._segment_starts = np.zeros(len(docs), dtype=np.int32)
+
+        # The tokens of all docs are concatenated, matches are shifted by the number of
+        # preceding tokens
+        token_offset = 0
+
+        for i, doc in enumerate(docs):
+
+            self._segment_starts[i] = token_offset
+
+            self._match_spacy_triggers(doc, self.phrase_matcher, token_offset)
+            self._match_spacy_triggers(doc, self.pattern_matcher, token_offset)
 
-        # Spacy tokenize document and find matches using the spacy matchers
-        doc = self._nlp(text, disable=['parser', 'ner'])
-        self._sentence_length = len(doc)
+            self._match_regexp_triggers(doc.text, doc, token_offset)
 
-        self._match_spacy_triggers(doc, self.phrase_matcher)
-        self._match_spacy_triggers(doc, self.pattern_matcher)
+            token_offset += len(doc)
 
-        self._match_regexp_triggers(text, doc)
+        self._sentence_length = token_offset
+
+    def _segment_boundaries(self):
+        # The start of each sentence of a batch, except those at the start or end of the batch
+        # (the first sentence, and empty sentences)
+
+        segment_starts = self._segment_starts[1:]
+
+        return segment_starts[(segment_starts > 0) & (segment_starts < self._sentence_length)]
 
     def _split_matches_per_context(self):
 
@@ -247,91 +473,126 @@ class ContextMatcher:
 
         return (context_class_to_matched_rules)
 
+    def _get_buffers(self, level_dim):
+        """
+        The buffers used to resolve scopes, which are reused across calls and only grown when a
+        longer sentence or a context class with more levels is processed:
+
+            token_mask      (level_dim, position, sentence length) bool, whether a trigger matches
+            trigger_index   (level_dim - 2, sentence length) int, index of the nearest trigger
+            terminate_index (level_dim - 2, sentence length) int, index of the nearest termination
+        """
+
+        if self._token_mask_buffer.shape[0] < level_dim or \
+                self._token_mask_buffer.shape[2] < self._sentence_length:
+
+            level_capacity = max(level_dim, self._token_mask_buffer.shape[0])
+            length_capacity = max(2 * self._sentence_length, self._token_mask_buffer.shape[2])
+
+            self._token_mask_buffer = np.zeros((level_capacity, len(POSITION_TO_IND), length_capacity),
+                                               dtype=bool)
+            self._trigger_index_buffer = np.zeros((level_capacity, length_capacity), dtype=np.int32)
+            self._terminate_index_buffer = np.zeros((level_capacity, length_capacity), dtype=np.int32)
+            self._token_index = np.arange(length_capacity, dtype=np.int32)
+
+        return (self._token_mask_buffer[:level_dim, :, :self._sentence_length],
+                self._trigger_index_buffer[:level_dim - 2, :self._sentence_length],
+                self._terminate_index_buffer[:level_dim - 2, :self._sentence_length])
+
     def _get_initialized_token_mask(self, level_dim, matched_rules):
 
-        # Create a numpy array with token_mask, with three dimensions:
+        # A boolean token_mask, with three dimensions:
         # axis=0   Level (level 0 = nonexisting, level 1 = default (RECENT/AFFIRMED) and will not be used)
         # axis=1   Position
         # axis=2   Sentence length
-        token_mask = np.zeros((level_dim,
-                               len(POSITION_TO_IND.keys()),
-                               self._sentence_length)
-                              )
+        token_mask, _, _ = self._get_buffers(level_dim)
+        token_mask[:] = False
 
         # Iterate over the matched rules
         for matched_rule in matched_rules:
 
-            # Set token_mask to 1 where rules are matched
+            # Set token_mask where rules are matched
             token_mask[matched_rule.level.value,
                        POSITION_TO_IND[matched_rule.position],
-                       matched_rule.token_start[0]:matched_rule.token_end[0]] = 1
+                       matched_rule.token_start[0]:matched_rule.token_end[0]] = True
 
         return token_mask
 
     def _forward_fill_token_mask(self, token_mask, level_dim):
 
-        # Forward fill preceding triggers
-        # Iterate over levels
-        for j in range(2, level_dim):
+        # Forward fill preceding triggers, for all levels at once: a token is in scope when the
+        # last preceding trigger (without a pseudo trigger) at or before it comes after the last
+        # termination trigger at or before it. Both are found with a cumulative maximum.
+        _, trigger_index, terminate_index = self._get_buffers(level_dim)
+        token_index = self._token_index[:self._sentence_length]
+
+        preceding = token_mask[2:, POSITION_TO_IND['preceding']]
+        pseudo = token_mask[2:, POSITION_TO_IND['pseudo']]
+        termination = token_mask[2:, POSITION_TO_IND['termination']]
 
-            # Fill value
-            pre_shift = 0
+        trigger_index[:] = -1
+        np.copyto(trigger_index, token_index, where=np.greater(preceding, pseudo))
+        np.maximum.accumulate(trigger_index, axis=1, out=trigger_index)
 
-            # Iterate over tokens
-            for i in range(self._sentence_length):
+        terminate_index[:] = -1
+        np.copyto(terminate_index, token_index, where=termination)
 
-                # If matches a preceding trigger and no pseudo trigger, set fill value to 1
-                if (token_mask[j, POSITION_TO_IND['preceding'], i] == 1) and (token_mask[j, POSITION_TO_IND['pseudo'], i] == 0):
-                    pre_shift = 1
+        # Scopes end with the sentence, as if the last token of the previous sentence terminates
+        boundaries = self._segment_boundaries()
+        terminate_index[:, boundaries] = np.maximum(terminate_index[:, boundaries], boundaries - 1)
 
-                # If matches a termination trigger, set fill value to 0
-                if (token_mask[j, POSITION_TO_IND['termination'], i] == 1):
-                    pre_shift = 0
+        np.maximum.accumulate(terminate_index, axis=1, out=terminate_index)
 
-                # Change to fill value
-                token_mask[j, POSITION_TO_IND['preceding'], i] = pre_shift
+        np.greater(trigger_index, terminate_index, out=preceding)
 
         return (token_mask)
 
     def _backward_fill_token_mask(self, token_mask, level_dim):
 
-        # Iterate over levels
-        for j in range(2, level_dim):
+        # Backward fill following triggers, in the same way as _forward_fill_token_mask, but with
+        # the first trigger and termination at or after each token (a cumulative minimum in
+        # reversed order)
+        _, trigger_index, terminate_index = self._get_buffers(level_dim)
+        token_index = self._token_index[:self._sentence_length]
+
+        following = token_mask[2:, POSITION_TO_IND['following']]
+        pseudo = token_mask[2:, POSITION_TO_IND['pseudo']]
+        termination = token_mask[2:, POSITION_TO_IND['termination']]
 
-            # Fill value
-            post_shift = 0
+        trigger_index[:] = self._sentence_length
+        np.copyto(trigger_index, token_index, where=np.greater(following, pseudo))
+        np.minimum.accumulate(trigger_index[:, ::-1], axis=1, out=trigger_index[:, ::-1])
 
-            # Iterate over tokens in reversed order
-            for i in reversed(range(self._sentence_length)):
+        terminate_index[:] = self._sentence_length
+        np.copyto(terminate_index, token_index, where=termination)
 
-                # If matches a following trigger and no pseudo trigger, set fill value to 1
-                if (token_mask[j, POSITION_TO_IND['following'], i] == 1) and (token_mask[j, POSITION_TO_IND['pseudo'], i] == 0):
-                    post_shift = 1
+        # Scopes end with the sentence, as if the first token of the next sentence terminates
+        boundaries = self._segment_boundaries()
+        terminate_index[:, boundaries - 1] = np.minimum(terminate_index[:, boundaries - 1], boundaries)
 
-                # If matches a termination trigger, set fill value to 0
-                if (token_mask[j, POSITION_TO_IND['termination'], i] == 1):
-                    post_shift = 0
+        np.minimum.accumulate(terminate_index[:, ::-1], axis=1, out=terminate_index[:, ::-1])
 
-                # Change to fill value
-                token_mask[j, POSITION_TO_IND['following'], i] = post_shift
+        np.less(trigger_index, terminate_index, out=following)
 
         return (token_mask)
 
     def _process_token_mask(self, token_mask, level_dim):
 
-        # Take the maximum of the 'preceding' and 'following masks'
-        token_mask = np.max(token_mask[:, :2, :], axis=1)
+        # Tokens that are in the scope of a 'preceding' or 'following' trigger
+        in_scope = np.logical_or(token_mask[:, POSITION_TO_IND['preceding']],
+                                 token_mask[:, POSITION_TO_IND['following']])
 
         # Multiply with range to obtain index
-        token_mask = token_mask * np.arange(level_dim).reshape(-1, 1)
+        levels = np.arange(level_dim, dtype=np.min_scalar_type(level_dim)).reshape(-1, 1)
+        token_levels = in_scope * levels
 
         # Take maximum over levels
-        token_mask = np.max(token_mask, axis=0)
+        token_levels = np.max(token_levels, axis=0)
 
         # Make sure default is used when nothing matches
-        token_mask[token_mask == 0] = 1
+        token_levels[token_levels == 0] = 1
 
-        return (token_mask)
+        return (token_levels)
 
     def _get_token_mask_per_class(self, context_class, context_class_to_matched_rules):
 
@@ -340,7 +601,7 @@ class ContextMatcher:
 
         # If there are no rules, revert to default label
         if len(matched_rules) == 0:
-            token_mask = np.ones(self._sentence_length).reshape(-1, 1)
+            token_mask = np.ones(self._sentence_length, dtype=np.int8)
 
         # Otherwise compute token_mask
         else:
@@ -363,7 +624,108 @@ class ContextMatcher:
 
         return token_mask
 
-    def _process_matches(self, entities):
+    def _get_scopes_per_class(self, context_class, context_class_to_matched_rules):
+        '''
+        The scopes of the triggers of a context class as sorted intervals, for the interval scope
+        engine. Returns a list of (level, starts, ends) from the highest level down, where the
+        intervals contain the tokens that are in the scope of a trigger of that level or higher.
+        '''
+
+        # Fetch rules, and collect the intervals of each level and position
+        matched_rules = context_class_to_matched_rules[context_class.__name__]
+
+        intervals = {}
+
+        for matched_rule in matched_rules:
+            intervals.setdefault((matched_rule.level.value, matched_rule.position), []).append(
+                (matched_rule.token_start[0], matched_rule.token_end[0]))
+
+        # Level 0 is nonexisting, level 1 is the default
+        levels = sorted({level for (level, _) in intervals if level >= 2}, reverse=True)
+
+        scopes = []
+        cumulative_scope = []
+
+        for level in levels:
+
+            termination = merge_intervals(intervals.get((level, 'termination'), []))
+            pseudo = merge_intervals(intervals.get((level, 'pseudo'), []))
+
+            # Tokens that match a termination or pseudo trigger are not triggers themselves
+            not_triggers = merge_intervals(termination + pseudo)
+
+            preceding = subtract_intervals(merge_intervals(intervals.get((level, 'preceding'), [])),
+                                           not_triggers)
+            following = subtract_intervals(merge_intervals(intervals.get((level, 'following'), [])),
+                                           not_triggers)
+
+            scope = self._forward_scopes(preceding, termination) + \
+                self._backward_scopes(following, termination)
+
+            cumulative_scope = merge_intervals(cumulative_scope + scope, merge_adjacent=True)
+
+            scopes.append((level,
+                           [start for (start, _) in cumulative_scope],
+                           [end for (_, end) in cumulative_scope]))
+
+        return scopes
+
+    def _forward_scopes(self, preceding, termination):
+        # The scope of preceding triggers lasts until the first termination trigger after it, or
+        # the end of the sentence
+
+        termination_starts = [start for (start, _) in termination]
+        segment_starts = self._segment_starts.tolist()
+
+        scopes = []
+
+        for start, end in preceding:
+
+            i = bisect_left(termination_starts, start)
+            scope_end = termination_starts[i] if i < len(termination_starts) else self._sentence_length
+
+            segment = bisect_right(segment_starts, start)
+
+            if segment < len(segment_starts):
+                scope_end = min(scope_end, segment_starts[segment])
+
+            scopes.append((start, scope_end))
+
+        return scopes
+
+    def _backward_scopes(self, following, termination):
+        # The scope of following triggers lasts back until the last termination trigger before it,
+        # or the start of the sentence
+
+        termination_starts = [start for (start, _) in termination]
+        segment_starts = self._segment_starts.tolist()
+
+        scopes = []
+
+        for start, end in following:
+
+            i = bisect_left(termination_starts, start) - 1
+            scope_start = termination[i][1] if i >= 0 else 0
+
+            segment = bisect_right(segment_starts, start) - 1
+            scope_start = max(scope_start, segment_starts[segment])
+
+            scopes.append((scope_start, end))
+
+        return scopes
+
+    def _get_scope_level(self, scopes, token_start, token_end):
+        # The level of the tokens token_start, ..., token_end - 1, i.e. the highest level of
+        # which all tokens are in scope (see _get_scopes_per_class), or the default level
+
+        for level, starts, ends in scopes:
+            if covers(starts, ends, token_start, token_end):
+                return level
+
+        return 1
+
+    def _process_matches(self, entity_lists):
+        # Label the entities of each sentence (of a batch)
 
         if self._matched_rules is None:
             raise NameError("Matcher not yet called.")
@@ -373,22 +735,110 @@ class ContextMatcher:
         # Iterate over context classes (e.g. NegationContext)
         for context_class in self._context_classes:
 
-            token_mask = self._get_token_mask_per_class(
-                context_class, context_class_to_matched_rules)
+            if self.scope_engine == "interval":
+                scopes = self._get_scopes_per_class(
+                    context_class, context_class_to_matched_rules)
+            else:
+                token_mask = self._get_token_mask_per_class(
+                    context_class, context_class_to_matched_rules)
 
             # For each entity, add appropriate label
-            for entity in entities:
+            for segment_start, entities in zip(self._segment_starts, entity_lists):
+                for entity in entities:
+
+                    token_start = segment_start + entity.token_start
+                    token_end = segment_start + entity.token_end
+
+                    # Take the lowest match
+                    if self.scope_engine == "interval":
+                        enum_value = self._get_scope_level(scopes, token_start, token_end)
+                    else:
+                        enum_value = int(np.min(token_mask[token_start:token_end]))
 
-                # Take the lowest match
-                enum_value = np.min(
-                    token_mask[entity.token_start:entity.token_end])
-                enum_label = context_class(enum_value).name
-                entity.add_context(enum_label)
+                    enum_label = context_class(enum_value).name
+                    entity.add_context(enum_label)
 
     def match_context(self, text, entities):
+        '''
+        Match the context of the entities of a sentence, and add the label of each context class
+        to each entity.
+
+        Arguments:
+            text (str or Doc) - The sentence, or a spacy Doc of the sentence (for instance the one
+                that the entities were extracted from), so that it is not tokenized again
+            entities (list) - The entities, which are modified
+        '''
 
         if len(entities) > 0:
 
             self._match_triggers(text)
 
-            self._process_matches(entities)
+            self._process_matches([entities])
+
+    def match_context_many(self, texts, entity_lists, batch_size=1000, n_process=1):
+        '''
+        Match the context of the entities of many sentences, as match_context does for each
+        sentence. The sentences are tokenized with nlp.pipe, and the scopes of the triggers of a
+        batch of sentences are resolved at once, over the concatenated tokens of the batch.
+
+        Arguments:
+            texts (iterable) - The sentences, or spacy Docs of the sentences (see match_context)
+            entity_lists (iterable) - The list of entities of each sentence, which are modified
+            batch_size (int) - The number of sentences that are tokenized and resolved at once
+            n_process (int) - The number of processes used for tokenizing
+        '''
+
+        # The entities stay in this process (also when tokenizing with multiple processes), as do
+        # the sentences that are already Docs, which are not tokenized again (see _tokenize). The
+        # docs are returned in the same order as the texts.
+        pending = deque()
+
+        def texts_to_tokenize():
+
+            for text, entities in zip(texts, entity_lists):
+
+                # Sentences without entities do not need to be processed
+                if len(entities) == 0:
+                    continue
+
+                if isinstance(text, Doc):
+                    pending.append((self._tokenize(text), entities))
+                else:
+                    pending.append((None, entities))
+                    yield text
+
+        def docs_with_entities():
+
+            for doc in self._nlp.pipe(texts_to_tokenize(),
+                                      batch_size=batch_size,
+                                      n_process=n_process,
+                                      disable=self._disabled_components()):
+
+                # The Docs that precede this sentence
+                while pending[0][0] is not None:
+                    yield pending.popleft()
+
+                yield doc, pending.popleft()[1]
+
+            # The Docs after the last sentence that was tokenized
+            while len(pending) > 0:
+                yield pending.popleft()
+
+        batch_docs = []
+        batch_entity_lists = []
+
+        for doc, entities in docs_with_entities():
+
+            batch_docs.append(doc)
+            batch_entity_lists.append(entities)
+
+            if len(batch_docs) == batch_size:
+                self._match_triggers_in_docs(batch_docs)
+                self._process_matches(batch_entity_lists)
+
+                batch_docs = []
+                batch_entity_lists = []
+
+        if len(batch_docs) > 0:
+            self._match_triggers_in_docs(batch_docs)
+            self._process_matches(batch_entity_lists)
@@ -0,0 +1,77 @@
+"""
+This module contains functionality for sorted lists of intervals of token positions, used by the
+interval scope engine of the ContextMatcher. An interval (start, end) contains the tokens
+start, ..., end - 1.
+"""
+
+from bisect import bisect_right
+
+
+def merge_intervals(intervals, merge_adjacent=False):
+    """
+    Sort and merge intervals, so that they do not overlap.
+
+    Arguments:
+        intervals (list) - The intervals, as (start, end) tuples
+        merge_adjacent (bool) - Whether to also merge intervals where one ends at the start of the
+            other, for instance (0, 2) and (2, 3)
+
+    Returns:
+        The merged intervals, sorted by start
+    """
+
+    merged = []
+
+    for start, end in sorted(intervals):
+
+        if start >= end:
+            continue
+
+        if len(merged) > 0 and (start < merged[-1][1] or (merge_adjacent and start == merged[-1][1])):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+def subtract_intervals(intervals, removed):
+    """
+    The parts of the intervals that are not in any of the removed intervals. Both should be
+    merged (see merge_intervals).
+    """
+
+    result = []
+    i = 0
+
+    for start, end in intervals:
+
+        # Skip removed intervals that end before this interval
+        while i < len(removed) and removed[i][1] <= start:
+            i += 1
+
+        j = i
+
+        while j < len(removed) and removed[j][0] < end:
+
+            if removed[j][0] > start:
+                result.append((start, removed[j][0]))
+
+            start = max(start, removed[j][1])
+            j += 1
+
+        if start < end:
+            result.append((start, end))
+
+    return result
+
+
+def covers(starts, ends, start, end):
+    """
+    Whether the merged intervals (given by their sorted starts and ends, see merge_intervals with
+    merge_adjacent=True) contain all tokens of the interval (start, end).
+    """
+
+    i = bisect_right(starts, start) - 1
+
+    return i >= 0 and ends[i] >= end
@@ -1,5 +1,6 @@
 import spacy
 from spacy.matcher import PhraseMatcher
+from spacy.tokens import Doc
 
 from psynlp.entity import Entity
 
@@ -20,7 +21,7 @@ class BasicEntityMatcher(EntityMatcher):
     A straightforward entity matcher, that outputs a list of entites that is found in a text.
     '''
 
-    def __init__(self, entity_sets, spacy_model, case_sensitive=False):
+    def __init__(self, entity_sets, spacy_model, case_sensitive=False, tokenizer_only=False):
         '''
         Initialize by adding the entities and the spacy model.
 
@@ -28,12 +29,15 @@ class BasicEntityMatcher(EntityMatcher):
             entity_sets (dict) - A dictionary of entity sets, with entity_sets[rule_name] = [phrase_1, ..., phrase_n]
             nlp (spacy model) - A spacy model
             case_sensitive (boolean) - Whether the entity matcher should be case sensitive
+            tokenizer_only (boolean) - Whether to only tokenize texts, rather than applying the full
+                pipeline (the phrases are matched on the text of the tokens only)
         '''
 
         # Nlp (tokenizer)
         spacy_model_path = get_global_resource(
             'spacy/{}'.format(spacy_model))
         self.nlp = spacy.load(spacy_model_path)
+        self.tokenizer_only = tokenizer_only
 
         # Determine spacy attribute
         if case_sensitive:
@@ -48,19 +52,39 @@ class BasicEntityMatcher(EntityMatcher):
             self.ent_matcher.add(
                 entity_key, [*list(self.nlp.tokenizer.pipe(entity_sets[entity_key]))])
 
+    def tokenize(self, text):
+        '''
+        Tokenize the text (and apply the full pipeline, unless tokenizer_only is set). The Doc can
+        be passed to extract_entities and ContextMatcher.match_context, so that the text is
+        only tokenized once.
+
+        Arguments:
+            text (str) - The text
+        '''
+
+        if self.tokenizer_only:
+            return self.nlp.make_doc(text)
+
+        return self.nlp(text)
+
     def extract_entities(self, text):
         '''
         Extract the entities in the text, based on the entity_sets.
 
         Arguments:
-            text (str) - The text in which entities should be matched.
+            text (str or Doc) - The text in which entities should be matched, or a spacy Doc of
+                the text (see tokenize)
         '''
 
         # Empty list of entities
         entities = []
 
-        # Tokenize and run matcher
-        doc = self.nlp(text)
+        # Tokenize (unless already tokenized) and run matcher
+        if isinstance(text, Doc):
+            doc = text
+        else:
+            doc = self.tokenize(text)
+
         matches = self.ent_matcher(doc)
 
         # For each match found by the PhraseMatcher
@@ -0,0 +1,164 @@
+"""
+This module contains functionality for the CompoundSplitter class.
+"""
+
+import functools
+
+from psynlp.spelling.editdisttrie import EditDistTrie, EditDistTrieOverlay
+
+
+class CompoundSplitter:
+    """
+    Splits compound tokens into parts that are each in the lexicon, for instance
+    behandelplanbespreking = behandelplan + bespreking. Parts are at least min_part_length
+    characters long, and can be separated by a (maximal) run of separator characters, for
+    instance weekend-verlof = weekend + verlof.
+
+    The token is scanned against a prefix index (an EditDistTrie of the lexicon), which finds all
+    lexicon words starting at a position in a single pass, and a suffix index (an EditDistTrie of
+    the reversed lexicon), which finds all lexicon words that end the token in a single pass.
+    Compounds of more than two parts are found with a breadth first search over the positions
+    where a part can start, so that each position is scanned at most once. Decompositions are
+    memoized.
+    """
+
+    def __init__(self, prefix_index, suffix_index, min_part_length=3, max_parts=2, separators="s-",
+                 cache_size=65536):
+        """
+        Initialize using the indices.
+
+        Arguments:
+            prefix_index (EditDistTrieOverlay) - The lexicon
+            suffix_index (EditDistTrieOverlay) - The reversed words of the lexicon
+            min_part_length (int) - The minimum length of each part
+            max_parts (int) - The maximum number of parts, or None for no maximum
+            separators (str) - The characters that can separate two parts
+            cache_size (int) - The number of memoized decompositions, None for no limit
+        """
+
+        if max_parts is not None and max_parts < 2:
+            raise ValueError("max_parts should be at least 2")
+
+        self.prefix_index = prefix_index
+        self.suffix_index = suffix_index
+        self.min_part_length = min_part_length
+        self.max_parts = max_parts
+        self.separators = separators
+
+        self._split_cache = functools.lru_cache(maxsize=cache_size)(self._split_uncached)
+
+    @classmethod
+    def from_lexicon(cls, lexicon, prefix_index=None, **kwargs):
+        """
+        Initialize by building the indices from the lexicon. An EditDistTrieOverlay of the same
+        lexicon can be passed as the prefix_index, so that it is not built twice.
+        """
+
+        if prefix_index is None:
+            prefix_index = EditDistTrieOverlay(EditDistTrie(lexicon))
+
+        suffix_index = EditDistTrieOverlay(EditDistTrie(word[::-1] for word in lexicon))
+
+        return cls(prefix_index, suffix_index, **kwargs)
+
+    def split(self, token):
+        """
+        Returns the parts of the compound token with the fewest parts (as a tuple, without the
+        separators), or None if the token is not a compound.
+        """
+
+        return self._split_cache(token)
+
+    def add_words(self, words):
+        """ Add words to the indices, and empty the cache """
+
+        self.prefix_index.add_words(words)
+        self.suffix_index.add_words(word[::-1] for word in words)
+        self.clear_cache()
+
+    def remove_words(self, words):
+        """ Remove words from the indices, and empty the cache """
+
+        self.prefix_index.remove_words(words)
+        self.suffix_index.remove_words(word[::-1] for word in words)
+        self.clear_cache()
+
+    def clear_cache(self):
+        self._split_cache.cache_clear()
+
+    def _split_uncached(self, token):
+
+        n = len(token)
+
+        if n < 2 * self.min_part_length:
+            return None
+
+        # Positions i where token[i:] is a last part, found with one scan of the reversed token
+        last_part_starts = {n - length
+                            for length in self.suffix_index.prefix_lengths(token[::-1])
+                            if length >= self.min_part_length}
+
+        if len(last_part_starts) == 0:
+            return None
+
+        # Breadth first search over the start positions of parts, so that the decomposition
+        # with the fewest parts is found first, and each start position is only scanned once
+        previous = {0: None}
+        starts = [0]
+        num_parts = 1
+
+        while len(starts) > 0 and (self.max_parts is None or num_parts < self.max_parts):
+
+            next_starts = []
+
+            for start in starts:
+                for length in self.prefix_index.prefix_lengths(token, start):
+
+                    end = start + length
+
+                    if length < self.min_part_length or end == n:
+                        continue
+
+                    for next_start in self._next_part_starts(token, end):
+
+                        if next_start in previous:
+                            continue
+
+                        previous[next_start] = (start, end)
+
+                        if next_start in last_part_starts:
+                            return self._parts(token, previous, next_start)
+
+                        next_starts.append(next_start)
+
+            starts = next_starts
+            num_parts += 1
+
+        return None
+
+    def _next_part_starts(self, token, end):
+        """ The next part starts directly after a part, or after a maximal run of separators """
+
+        yield end
+
+        if token[end] in self.separators and token[end - 1] not in self.separators:
+
+            next_start = end
+
+            while next_start < len(token) and token[next_start] in self.separators:
+                next_start += 1
+
+            if next_start < len(token):
+                yield next_start
+
+    def _parts(self, token, previous, last_part_start):
+        """ Reconstruct the parts from the start position of the last part """
+
+        parts = [token[last_part_start:]]
+        start = last_part_start
+
+        while previous[start] is not None:
+            (start, end) = previous[start]
+            parts.append(token[start:end])
+
+        return tuple(reversed(parts))
@@ -0,0 +1,114 @@
+"""
+This module contains functionality for computing edit distances (Levenshtein distances), using the
+bit-parallel algorithm by Myers (1999), A fast bit-vector algorithm for approximate string matching
+based on dynamic programming, in the formulation for the edit distance by Hyyrö (2001), Explaining
+and extending the bit-parallel approximate string matching algorithm of Myers.
+
+The columns of the dynamic programming matrix are not stored as lists, but as two bit vectors
+(Python integers of arbitrary length) with the vertical differences between adjacent cells, which
+are updated with a constant number of integer operations per letter.
+"""
+
+
+def _pattern_masks(pattern):
+    """ For each letter in the pattern, the bit vector of the positions where it occurs """
+
+    masks = {}
+
+    for i, letter in enumerate(pattern):
+        masks[letter] = masks.get(letter, 0) | (1 << i)
+
+    return masks
+
+
+def _bit_parallel_distance(masks, length, text, max_distance=None):
+    """
+    The edit distance between the pattern (given by its masks and length) and the text. If a
+    max_distance is given, max_distance + 1 is returned as soon as it is clear that the distance
+    exceeds it.
+    """
+
+    if length == 0:
+        return len(text)
+
+    full = (1 << length) - 1
+    last = 1 << (length - 1)
+
+    positive_vertical = full
+    negative_vertical = 0
+    score = length
+    remaining = len(text)
+
+    for letter in text:
+
+        equal = masks.get(letter, 0)
+
+        x_vertical = equal | negative_vertical
+        x_horizontal = (((equal & positive_vertical) + positive_vertical) ^ positive_vertical) | equal
+
+        positive_horizontal = negative_vertical | (~(x_horizontal | positive_vertical) & full)
+        negative_horizontal = positive_vertical & x_horizontal
+
+        if positive_horizontal & last:
+            score += 1
+        elif negative_horizontal & last:
+            score -= 1
+
+        remaining -= 1
+
+        # Each remaining letter of the text can decrease the distance by at most one
+        if max_distance is not None and score - remaining > max_distance:
+            return max_distance + 1
+
+        positive_horizontal = ((positive_horizontal << 1) | 1) & full
+        negative_horizontal = (negative_horizontal << 1) & full
+
+        positive_vertical = negative_horizontal | (~(x_vertical | positive_horizontal) & full)
+        negative_vertical = positive_horizontal & x_vertical
+
+    return score
+
+
+def edit_distance(word_1, word_2):
+    """ Levenshtein distance between two words """
+
+    return _bit_parallel_distance(_pattern_masks(word_1), len(word_1), word_2)
+
+
+def bounded_edit_distance(word_1, word_2, max_distance):
+    """
+    Levenshtein distance between two words. Returns max_distance + 1 as soon as it is clear
+    that the distance exceeds max_distance.
+    """
+
+    # The edit distance is at least the difference in length
+    if abs(len(word_1) - len(word_2)) > max_distance:
+        return max_distance + 1
+
+    return _bit_parallel_distance(_pattern_masks(word_1), len(word_1), word_2, max_distance)
+
+
+def edit_distances(word, candidates, max_distance=None):
+    """
+    Levenshtein distances between one word and many candidates, where the bit vectors of the word
+    are only computed once.
+
+    Arguments:
+        word (str) - The word
+        candidates (iterable) - The candidates
+        max_distance (int) - If given, the distance of candidates that are further away than
+            max_distance is max_distance + 1, see bounded_edit_distance
+
+    Returns:
+        A list with the distance of each candidate
+    """
+
+    masks = _pattern_masks(word)
+    length = len(word)
+
+    if max_distance is None:
+        return [_bit_parallel_distance(masks, length, candidate) for candidate in candidates]
+
+    return [max_distance + 1 if abs(length - len(candidate)) > max_distance
+            else _bit_parallel_distance(masks, length, candidate, max_distance)
+            for candidate in candidates]
@@ -1,35 +1,101 @@
-""" 
-This module contains functionality for the EditDistTrie class. 
-Taken (and slightly adapted) from: http://stevehanov.ca/blog/?id=114
 """
+This module contains functionality for the EditDistTrie class.
+The search is taken (and slightly adapted) from: http://stevehanov.ca/blog/?id=114
+The minimized automaton is built using the incremental algorithm for sorted input by
+Daciuk et al. (2000), Incremental Construction of Minimal Acyclic Finite-State Automata.
+"""
+
+from array import array
+from bisect import bisect_left
+from multiprocessing import Pool
+import heapq
+import os
 
 
 class EditDistTrie:
-    """ An EditDistTrie a fast way to lookup all matches with edit_dist <= max_cost in a lexicon """
+    """
+    An EditDistTrie a fast way to lookup all matches with edit_dist <= max_cost in a lexicon.
+
+    Internally, the lexicon is stored as a minimized acyclic automaton (DAWG), in which
+    common prefixes and common suffixes are shared. Nodes and edges are stored in flat
+    typed arrays rather than in one Python object per character:
+
+        _node_final[n]                  1 if a word ends in node n, else 0
+        _node_edges[n]:_node_edges[n+1] the range of edges leaving node n
+        _edge_labels[e]                 the character (code point) on edge e
+        _edge_targets[e]                the node edge e points to
+        _node_shortest[n]               the length of the shortest path from node n to a word end
+        _node_longest[n]                the length of the longest path from node n to a word end
+
+    Node 0 is the root.
+    """
 
     def __init__(self, lexicon):
         """ Initalize using the lexicon """
 
-        self._trie = _TrieNode()
+        builder = _DawgBuilder()
+        words = sorted(set(lexicon))
+
+        for word in words:
+            builder.insert(word)
+
+        self._num_words = len(words)
+
+        (self._node_final,
+         self._node_edges,
+         self._edge_labels,
+         self._edge_targets,
+         self._node_shortest,
+         self._node_longest) = builder.finish()
+
+    def to_buffers(self):
+        """ Returns the arrays that fully describe this automaton """
+
+        return {'node_final': self._node_final,
+                'node_edges': self._node_edges,
+                'edge_labels': self._edge_labels,
+                'edge_targets': self._edge_targets,
+                'node_shortest': self._node_shortest,
+                'node_longest': self._node_longest}
+
+    @classmethod
+    def from_buffers(cls, buffers):
+        """ Initialize from the (possibly memory-mapped) arrays returned by to_buffers """
+
+        trie = cls.__new__(cls)
 
-        for word in lexicon:
-            self._trie.insert(word)
+        trie._node_final = buffers['node_final']
+        trie._node_edges = buffers['node_edges']
+        trie._edge_labels = buffers['edge_labels']
+        trie._edge_targets = buffers['edge_targets']
+        trie._node_shortest = buffers['node_shortest']
+        trie._node_longest = buffers['node_longest']
+        trie._num_words = None
 
-    def search_matches(self, word, max_cost=2):
+        return trie
+
+    def search_matches(self, word, max_cost=2, top_k=None, priority=None):
         """
         The search function returns a list of all words that are less than the given
-        maximum distance from the target word
+        maximum distance from the target word.
+
+        If top_k is given, only the top_k best matches are returned, where matches are ordered
+        by edit distance, then by descending priority(word) (if a priority function is given),
+        and then alphabetically. See _search_top_k.
         """
 
+        if top_k is not None:
+            return self._search_top_k(word, max_cost, top_k, priority)
+
         # build first row
         current_row = range(len(word) + 1)
 
         results = []
 
-        # recursively search each branch of the trie
-        for letter in self._trie.children:
-            self._searchRecursive(self._trie.children[letter],
-                                  letter,
+        # recursively search each branch of the automaton
+        for edge in range(self._node_edges[0], self._node_edges[1]):
+            self._searchRecursive(edge,
+                                  "",
                                   word,
                                   current_row,
                                   results,
@@ -37,12 +103,16 @@ class EditDistTrie:
 
         return results
 
-    def _searchRecursive(self, node, letter, word, previous_row, results, max_cost):
-        """ 
+    def _searchRecursive(self, edge, prefix, word, previous_row, results, max_cost):
+        """
         This recursive helper is used by the search function above. It assumes that
         the previous_row has been filled in already.
         """
 
+        letter = chr(self._edge_labels[edge])
+        node = self._edge_targets[edge]
+        prefix = prefix + letter
+
         columns = len(word) + 1
         current_row = [previous_row[0] + 1]
 
@@ -61,42 +131,604 @@ class EditDistTrie:
             current_row.append(min(insert_cost, delete_cost, replace_cost))
 
         # if the last entry in the row indicates the optimal cost is less than the
-        # maximum cost, and there is a word in this trie node, then add it.
-        if current_row[-1] <= max_cost and node.word is not None:
-            results.append((node.word, current_row[-1]))
-
-        # if any entries in the row are less than the maximum cost, then
-        # recursively search each branch of the trie
-        if min(current_row) <= max_cost:
-            for letter in node.children:
-                self._searchRecursive(node.children[letter],
-                                      letter,
+        # maximum cost, and a word ends in this node, then add it.
+        if current_row[-1] <= max_cost and self._node_final[node]:
+            results.append((prefix, current_row[-1]))
+
+        # if the words below this node can be less than the maximum cost away, then
+        # recursively search each branch of the automaton
+        if self._lower_bound(node, current_row) <= max_cost:
+            for next_edge in range(self._node_edges[node], self._node_edges[node + 1]):
+                self._searchRecursive(next_edge,
+                                      prefix,
                                       word,
                                       current_row,
                                       results,
                                       max_cost)
 
+    def _lower_bound(self, node, row):
+        """
+        A lower bound for the edit distance of all words that end below node. Entry j of the row
+        is the edit distance between the prefix and the first j letters of the target word. The
+        remaining len(row) - 1 - j letters should then be matched by a suffix of at least
+        _node_shortest[node] and at most _node_longest[node] letters, which costs at least the
+        difference in length.
+        """
+
+        shortest = self._node_shortest[node]
+        longest = self._node_longest[node]
+        remaining = len(row) - 1
+
+        lower_bound = remaining + shortest
+
+        for cost in row:
+
+            if remaining > longest:
+                cost += remaining - longest
+            elif remaining < shortest:
+                cost += shortest - remaining
+
+            if cost < lower_bound:
+                lower_bound = cost
+
+            remaining -= 1
+
+        return lower_bound
+
+    def _search_top_k(self, word, max_cost, top_k, priority):
+        """
+        Iterative best first search that only keeps the top_k best matches. Nodes are visited
+        in order of the lower bound for the edit distance of all words below that node (see
+        _lower_bound), and the search stops when the lower bound exceeds the edit distance of
+        the worst match that is kept.
+        """
+
+        if top_k <= 0:
+            return []
+
+        columns = len(word) + 1
+
+        # Heap of nodes to visit, as (lower_bound, counter, node, prefix, row)
+        to_visit = [(0, 0, 0, "", list(range(columns)))]
+        counter = 1
+
+        # Heap of the top_k matches, with the worst match first, as (negated sort key, word)
+        best = []
+
+        while len(to_visit) > 0:
+
+            (lower_bound, _, node, prefix, previous_row) = heapq.heappop(to_visit)
+
+            if len(best) == top_k and lower_bound > -best[0][0][0]:
+                break
+
+            for edge in range(self._node_edges[node], self._node_edges[node + 1]):
+
+                letter = chr(self._edge_labels[edge])
+                next_node = self._edge_targets[edge]
+                current_row = [previous_row[0] + 1]
+
+                for column in range(1, columns):
+                    current_row.append(min(current_row[column - 1] + 1,
+                                           previous_row[column] + 1,
+                                           previous_row[column - 1] + (word[column - 1] != letter)))
+
+                if current_row[-1] <= max_cost and self._node_final[next_node]:
+
+                    match = prefix + letter
+                    key = (-current_row[-1],
+                           priority(match) if priority is not None else 0,
+                           _ReversedString(match))
+
+                    if len(best) < top_k:
+                        heapq.heappush(best, (key, match))
+                    elif key > best[0][0]:
+                        heapq.heapreplace(best, (key, match))
+
+                next_lower_bound = self._lower_bound(next_node, current_row)
+
+                if next_lower_bound > max_cost:
+                    continue
+
+                if len(best) < top_k or next_lower_bound <= -best[0][0][0]:
+                    heapq.heappush(to_visit,
+                                   (next_lower_bound, counter, next_node, prefix + letter, current_row))
+                    counter += 1
+
+        best.sort(reverse=True)
+
+        return [(match, -key[0]) for (key, match) in best]
+
+    def prefix_lengths(self, word, start=0):
+        """
+        Returns the lengths of all words in the lexicon that occur in word at position start,
+        i.e. all lengths for which word[start:start + length] is in the lexicon, in ascending
+        order. The word is scanned only once, and scanning stops as soon as no word in the
+        lexicon continues with the scanned letters.
+        """
+
+        lengths = []
+        node = 0
+
+        for position in range(start, len(word)):
+
+            # Edges are sorted by label, so the edge with the next letter is found by bisection
+            label = ord(word[position])
+            first_edge = self._node_edges[node]
+            last_edge = self._node_edges[node + 1]
+            edge = bisect_left(self._edge_labels, label, first_edge, last_edge)
+
+            if edge == last_edge or self._edge_labels[edge] != label:
+                break
+
+            node = self._edge_targets[edge]
+
+            if self._node_final[node]:
+                lengths.append(position + 1 - start)
+
+        return lengths
+
+    def __contains__(self, word):
+
+        node_edges = self._node_edges
+        edge_labels = self._edge_labels
+        edge_targets = self._edge_targets
+
+        node = 0
+
+        for letter in word:
+
+            label = ord(letter)
+            last_edge = node_edges[node + 1]
+            edge = bisect_left(edge_labels, label, node_edges[node], last_edge)
+
+            if edge == last_edge or edge_labels[edge] != label:
+                return False
+
+            node = edge_targets[edge]
+
+        return self._node_final[node] == 1
+
+    def __iter__(self):
+        """ Iterate over the words in sorted order """
+
+        to_visit = [(0, "")]
+
+        while len(to_visit) > 0:
+
+            (node, prefix) = to_visit.pop()
+
+            if self._node_final[node]:
+                yield prefix
+
+            # Visit the edges with the lowest labels first
+            for edge in range(self._node_edges[node + 1] - 1, self._node_edges[node] - 1, -1):
+                to_visit.append((self._edge_targets[edge], prefix + chr(self._edge_labels[edge])))
+
+    def __len__(self):
+
+        # Not stored in the buffers, so counted once for a memory-mapped automaton: the number of
+        # words below each node is the same for all paths to that node
+        if self._num_words is None:
+
+            counts = [-1] * len(self._node_final)
+            to_visit = [0]
+
+            while len(to_visit) > 0:
+
+                node = to_visit[-1]
+                children = [self._edge_targets[edge]
+                            for edge in range(self._node_edges[node], self._node_edges[node + 1])]
+                uncounted = [child for child in children if counts[child] < 0]
+
+                if len(uncounted) > 0:
+                    to_visit.extend(uncounted)
+                    continue
+
+                to_visit.pop()
+                counts[node] = self._node_final[node] + sum(counts[child] for child in children)
+
+            self._num_words = counts[0]
+
+        return self._num_words
+
+    def length_bounds(self):
+        """ The lengths of the shortest and the longest word, (None, None) if there are no words """
+
+        if not self._node_final[0] and self._node_edges[0] == self._node_edges[1]:
+            return (None, None)
+
+        return (self._node_shortest[0], self._node_longest[0])
+
+
+class ShardedEditDistTrie:
+    """
+    A ShardedEditDistTrie has the same search_matches function as the EditDistTrie, but stores
+    the lexicon in a separate EditDistTrie for each word length. Since the edit distance is at
+    least the difference in length, a search with max_cost only visits the tries of words with
+    length len(word) - max_cost, ..., len(word) + max_cost, which avoids walking down long words
+    that share a prefix with the target word. Each word is stored in one trie only.
+    """
+
+    def __init__(self, lexicon, n_jobs=1):
+        """
+        Initialize using the lexicon, optionally building the tries in parallel.
+
+        Arguments:
+            lexicon (iterable) - The words in the lexicon
+            n_jobs (int) - The number of processes used to build the tries (None for the number of cpus)
+        """
+
+        words_per_length = {}
+
+        for word in set(lexicon):
+            words_per_length.setdefault(len(word), []).append(word)
+
+        lengths = sorted(words_per_length, key=lambda length: -len(words_per_length[length]))
+        word_lists = [words_per_length[length] for length in lengths]
+
+        if n_jobs is None:
+            n_jobs = os.cpu_count() or 1
+
+        if n_jobs > 1 and len(word_lists) > 1:
+            with Pool(min(n_jobs, len(word_lists))) as pool:
+                tries = pool.map(EditDistTrie, word_lists, chunksize=1)
+        else:
+            tries = [EditDistTrie(word_list) for word_list in word_lists]
+
+        self._tries = dict(zip(lengths, tries))
+
+    def to_buffers(self):
+        """ Returns the arrays that fully describe the tries """
+
+        return {"{}_{}".format(length, name): buffer
+                for length, trie in self._tries.items()
+                for name, buffer in trie.to_buffers().items()}
+
+    @classmethod
+    def from_buffers(cls, buffers):
+        """ Initialize from the (possibly memory-mapped) arrays returned by to_buffers """
+
+        buffers_per_length = {}
+
+        for key, buffer in buffers.items():
+            length, name = key.split("_", 1)
+            buffers_per_length.setdefault(int(length), {})[name] = buffer
+
+        sharded_trie = cls.__new__(cls)
+        sharded_trie._tries = {length: EditDistTrie.from_buffers(trie_buffers)
+                               for length, trie_buffers in buffers_per_length.items()}
+
+        return sharded_trie
 
-class _TrieNode:
+    def __contains__(self, word):
+        return len(word) in self._tries and word in self._tries[len(word)]
+
+    def search_matches(self, word, max_cost=2, top_k=None, priority=None):
+        """
+        Returns the same matches, in the same order, as EditDistTrie.search_matches.
+        """
+
+        results = []
+
+        for length in range(len(word) - max_cost, len(word) + max_cost + 1):
+            if length in self._tries:
+                results.extend(self._tries[length].search_matches(word, max_cost, top_k, priority))
+
+        # Same order as the EditDistTrie
+        return _sort_matches(results, top_k, priority)
+
+
+class EditDistTrieOverlay:
     """
-    The Trie data structure keeps a set of words, organized with one node for
-    each letter. Each node has a branch for each letter that may follow it in the
-    set of words.
+    An EditDistTrieOverlay adds words to and removes words from an EditDistTrie or a
+    ShardedEditDistTrie, without rebuilding it. This is also possible when the trie is read-only,
+    for instance memory-mapped from a snapshot.
+
+    Added words are kept in a few separate (small) EditDistTries, as in a log-structured merge
+    tree: the words of each call to add_words are put in a new trie, which is merged with the
+    last trie as long as that one is not larger. There are therefore at most log2(n) added tries
+    for n added words, and each added word is included in a rebuilt trie at most log2(n) times.
+    Removed words are kept in a set that is used to filter the matches of the trie. The cost of
+    adding or removing words is therefore proportional to the number of words that are added, not
+    to the size of the lexicon.
+    """
+
+    def __init__(self, trie):
+        """ Initialize using the trie, without any added or removed words """
+
+        self.trie = trie
+
+        # The added words, and the added tries as (words, trie), largest first. The added tries
+        # can still contain words that were removed again, which are filtered from the matches.
+        self._added = set()
+        self._added_tries = []
+        self._added_trie_words = set()
+
+        self._removed = set()
+
+    def has_changes(self):
+        """ Whether words were added or removed """
+
+        return len(self._added) > 0 or len(self._removed) > 0
+
+    def to_buffers(self):
+        """ Returns the arrays of the trie, which does not include the added or removed words """
+
+        if self.has_changes():
+            raise ValueError("The added and removed words are not included in the buffers of the trie")
+
+        return self.trie.to_buffers()
+
+    def add_words(self, words):
+        """ Add words """
+
+        new_words = []
+
+        for word in words:
+
+            if word in self._removed:
+                self._removed.discard(word)
+            elif word not in self._added and word not in self.trie:
+                self._added.add(word)
+
+                # Words that were added and removed again are still in an added trie
+                if word not in self._added_trie_words:
+                    self._added_trie_words.add(word)
+                    new_words.append(word)
+
+        if len(new_words) > 0:
+            self._push_added_trie(new_words)
+
+    def _push_added_trie(self, words):
+        """ Add a trie of the words, merged with the last added tries that are not larger """
+
+        while len(self._added_tries) > 0 and len(self._added_tries[-1][0]) <= len(words):
+            (last_words, _) = self._added_tries.pop()
+            words = last_words + words
+
+        # Words that were removed again are dropped when merging
+        removed_words = [word for word in words if word not in self._added]
+
+        if len(removed_words) > 0:
+            self._added_trie_words.difference_update(removed_words)
+            words = [word for word in words if word in self._added]
+
+        if len(words) > 0:
+            self._added_tries.append((words, EditDistTrie(words)))
+
+    def remove_words(self, words):
+        """ Remove words """
+
+        for word in words:
+
+            if word in self._added:
+                self._added.discard(word)
+            elif word in self.trie:
+                self._removed.add(word)
+
+    def search_matches(self, word, max_cost=2, top_k=None, priority=None):
+        """
+        Returns the same matches, in the same order, as EditDistTrie.search_matches on the
+        lexicon with the words added and removed.
+        """
+
+        # The removed words could be among the top_k best matches of the tries
+        trie_top_k = top_k + len(self._removed) if top_k is not None else None
+        added_top_k = top_k + len(self._added_trie_words) - len(self._added) if top_k is not None else None
+
+        results = [match for match in self.trie.search_matches(word, max_cost, trie_top_k, priority)
+                   if match[0] not in self._removed]
+
+        for (_, added_trie) in self._added_tries:
+            results.extend(match for match in added_trie.search_matches(word, max_cost, added_top_k, priority)
+                           if match[0] in self._added)
+
+        return _sort_matches(results, top_k, priority)
+
+    def __contains__(self, word):
+        return word in self._added or (word not in self._removed and word in self.trie)
+
+    def __iter__(self):
+        """ Iterate over the words (with the words added and removed) in sorted order """
+
+        return heapq.merge((word for word in self.trie if word not in self._removed), sorted(self._added))
+
+    def __len__(self):
+        return len(self.trie) + len(self._added) - len(self._removed)
+
+    def length_bounds(self):
+        """
+        The lengths of the shortest and the longest word, see EditDistTrie.length_bounds. Removed
+        words are not taken into account, so that the bounds can be less tight.
+        """
+
+        (shortest, longest) = self.trie.length_bounds()
+
+        if len(self._added) > 0:
+            lengths = [len(word) for word in self._added]
+            shortest = min(lengths) if shortest is None else min(shortest, min(lengths))
+            longest = max(lengths) if longest is None else max(longest, max(lengths))
+
+        return (shortest, longest)
+
+    def prefix_lengths(self, word, start=0):
+        """ Same as EditDistTrie.prefix_lengths, on the lexicon with the words added and removed """
+
+        lengths = [length for length in self.trie.prefix_lengths(word, start)
+                   if word[start:start + length] not in self._removed]
+
+        if len(self._added_tries) > 0:
+
+            lengths = set(lengths)
+
+            for (_, added_trie) in self._added_tries:
+                lengths.update(length for length in added_trie.prefix_lengths(word, start)
+                               if word[start:start + length] in self._added)
+
+            lengths = sorted(lengths)
+
+        return lengths
+
+
+def _sort_matches(results, top_k, priority):
+    """ Sort matches in the order of EditDistTrie.search_matches, and keep the top_k best """
+
+    if top_k is None:
+        results.sort()
+    else:
+        results.sort(key=lambda match: (match[1],
+                                        -priority(match[0]) if priority is not None else 0,
+                                        match[0]))
+        results = results[:max(top_k, 0)]
+
+    return results
+
+
+class _ReversedString:
+    """ Wraps a string to reverse its ordering, used to break ties alphabetically in a max heap """
+
+    __slots__ = ('string', )
+
+    def __init__(self, string):
+        self.string = string
+
+    def __lt__(self, other):
+        return self.string > other.string
+
+    def __eq__(self, other):
+        return self.string == other.string
+
+
+class _DawgBuilder:
+    """
+    Builds a minimized acyclic automaton from words that are inserted in sorted order.
+    Only the path of the last inserted word is kept unminimized, all other states are
+    kept in a register of unique states.
     """
 
     def __init__(self):
         """ Init """
 
-        self.word = None
-        self.children = {}
+        self._root = _DawgNode()
+        self._register = {}
+        self._unchecked = []
+        self._previous_word = ""
 
     def insert(self, word):
-        """ Insert word """
+        """ Insert word, words must be inserted in sorted order """
 
-        for letter in word:
-            if letter not in self.children:
-                self.children[letter] = _TrieNode()
+        if word < self._previous_word:
+            raise ValueError("Words must be inserted in sorted order")
+
+        # Find the common prefix with the previous word
+        common_prefix = 0
+
+        for letter_1, letter_2 in zip(word, self._previous_word):
+            if letter_1 != letter_2:
+                break
+            common_prefix += 1
+
+        # Minimize the states of the previous word that are not shared with this word
+        self._minimize(common_prefix)
+
+        if len(self._unchecked) == 0:
+            node = self._root
+        else:
+            node = self._unchecked[-1][2]
+
+        # Add the suffix of this word
+        for letter in word[common_prefix:]:
+            next_node = _DawgNode()
+            node.children[letter] = next_node
+            self._unchecked.append((node, letter, next_node))
+            node = next_node
+
+        node.final = True
+        self._previous_word = word
+
+    def _minimize(self, down_to):
+        """ Replace unchecked states by an equivalent registered state, if one exists """
+
+        for i in range(len(self._unchecked) - 1, down_to - 1, -1):
+
+            (parent, letter, child) = self._unchecked.pop()
+            key = child.key()
+
+            if key in self._register:
+                parent.children[letter] = self._register[key]
+            else:
+                child.id = len(self._register) + 1
+                child.set_path_lengths()
+                self._register[key] = child
+
+    def finish(self):
+        """ Minimize the remaining states and store the automaton in flat arrays """
+
+        self._minimize(0)
+        self._root.set_path_lengths()
+
+        node_final = array('B')
+        node_edges = array('I')
+        edge_labels = array('I')
+        edge_targets = array('I')
+        node_shortest = array('H')
+        node_longest = array('H')
+
+        # Assign an index to each state, in breadth first order from the root
+        node_index = {id(self._root): 0}
+        queue = [self._root]
+
+        for node in queue:
+
+            node_final.append(1 if node.final else 0)
+            node_edges.append(len(edge_labels))
+            node_shortest.append(node.shortest)
+            node_longest.append(node.longest)
+
+            for letter in sorted(node.children):
+
+                child = node.children[letter]
+
+                if id(child) not in node_index:
+                    node_index[id(child)] = len(queue)
+                    queue.append(child)
+
+                edge_labels.append(ord(letter))
+                edge_targets.append(node_index[id(child)])
+
+        node_edges.append(len(edge_labels))
+
+        return node_final, node_edges, edge_labels, edge_targets, node_shortest, node_longest
+
+
+class _DawgNode:
+    """
+    A temporary state that is only used while building the automaton.
+    """
+
+    __slots__ = ('id', 'final', 'children', 'shortest', 'longest')
+
+    def __init__(self):
+        """ Init """
+
+        self.id = None
+        self.final = False
+        self.children = {}
+        self.shortest = 0
+        self.longest = 0
+
+    def set_path_lengths(self):
+        """ Determine the shortest and longest path to a word end, given those of the children """
+
+        if self.final:
+            self.shortest = 0
+        else:
+            self.shortest = 1 + min((child.shortest for child in self.children.values()), default=-1)
+
+        self.longest = max([1 + child.longest for child in self.children.values()], default=0)
 
-            self = self.children[letter]
+    def key(self):
+        """ Two states are equivalent if they have equal finality and equal transitions """
 
-        self.word = word
\ No newline at end of file
+        return (self.final, tuple((letter, child.id) for letter, child in self.children.items()))
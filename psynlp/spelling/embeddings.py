@@ -0,0 +1,103 @@
+"""
+This module contains functionality for the WordEmbeddings class, and for exporting the arrays
+of a trained gensim Word2Vec model so that they can be memory-mapped.
+"""
+
+from gensim.models import Word2Vec
+
+import numpy as np
+
+from psynlp.spelling.frequencies import TokenFrequencies
+from psynlp.spelling.snapshot import read_snapshot, write_snapshot
+
+
+class WordEmbeddings:
+    """
+    The arrays of a Word2Vec model that are needed for ranking:
+
+        word2idx                the vocabulary, a mapping from word to row index
+        vectors                 the word vectors, float32 of shape (vocabulary size, vector size)
+        output_weights          the output weights (syn1neg), of the same shape as the vectors
+
+    When loaded from an exported file, the arrays are read-only views on the memory-mapped file,
+    so processes on the same host share the memory pages.
+    """
+
+    def __init__(self, word2idx, vectors, output_weights):
+        """ Initialize using the vocabulary and the (possibly memory-mapped) arrays """
+
+        self.word2idx = word2idx
+        self.vectors = vectors
+        self.output_weights = output_weights
+
+    @classmethod
+    def from_model(cls, w2v_model):
+        """ Initialize from a gensim Word2Vec model, supporting both gensim 3 and gensim 4 """
+
+        # gensim >= 4.0
+        if hasattr(w2v_model.wv, 'key_to_index'):
+            return cls(dict(w2v_model.wv.key_to_index), w2v_model.wv.vectors, w2v_model.syn1neg)
+
+        word2idx = {word: vocab.index for word, vocab in w2v_model.wv.vocab.items()}
+
+        return cls(word2idx, w2v_model.wv.vectors, w2v_model.trainables.syn1neg)
+
+    @classmethod
+    def load(cls, path):
+        """ Initialize by memory-mapping a file written by export """
+
+        metadata, sections = read_snapshot(path)
+
+        if metadata.get('type') != 'word2vec':
+            raise ValueError("{} does not contain exported word2vec arrays".format(path))
+
+        shape = (metadata['vocabulary_size'], metadata['vector_size'])
+
+        # The vocabulary is stored as a TokenFrequencies, with the row index as frequency
+        word2idx = TokenFrequencies.from_buffers({name[len('vocabulary_'):]: buffer
+                                                  for name, buffer in sections.items()
+                                                  if name.startswith('vocabulary_')})
+
+        vectors = np.frombuffer(sections['vectors'], dtype=np.float32).reshape(shape)
+        output_weights = np.frombuffer(sections['output_weights'], dtype=np.float32).reshape(shape)
+
+        return cls(word2idx, vectors, output_weights)
+
+    def export(self, path):
+        """
+        Write the vocabulary, vectors and output weights to a single binary file, with the arrays
+        as contiguous float32, that can be loaded using WordEmbeddings.load.
+        """
+
+        vocabulary = TokenFrequencies.from_dict(self.word2idx).to_buffers()
+
+        vectors = np.ascontiguousarray(self.vectors, dtype=np.float32)
+        output_weights = np.ascontiguousarray(self.output_weights, dtype=np.float32)
+
+        if vectors.shape != output_weights.shape:
+            raise ValueError("The vectors and output weights should have the same shape")
+
+        metadata = {'type': 'word2vec',
+                    'vocabulary_size': vectors.shape[0],
+                    'vector_size': vectors.shape[1]}
+
+        sections = {'vocabulary_' + name: buffer for name, buffer in vocabulary.items()}
+        sections['vectors'] = vectors
+        sections['output_weights'] = output_weights
+
+        write_snapshot(path, metadata, sections)
+
+
+def export_word2vec(w2v_model, path):
+    """
+    Export the arrays of a trained gensim Word2Vec model, for use by the EmbeddingRanker.
+
+    Arguments:
+        w2v_model (Word2Vec or str) - The model, or the path of a saved model
+        path (str) - The path of the exported file
+    """
+
+    if isinstance(w2v_model, str):
+        w2v_model = Word2Vec.load(w2v_model)
+
+    WordEmbeddings.from_model(w2v_model).export(path)
@@ -0,0 +1,277 @@
+"""
+This module contains functionality for the TokenFrequencies class, the frequency store that is
+shared by the SpellChecker and the NoisyRanker.
+"""
+
+from array import array
+from collections.abc import Mapping
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from psynlp.spelling.snapshot import read_snapshot, write_snapshot
+
+
+class TokenFrequencies(Mapping):
+    """
+    A read-only mapping from token to frequency, stored in flat arrays:
+
+        _tokens                                 all tokens utf-8 encoded and concatenated, in sorted order
+        _offsets[i]:_offsets[i+1]               the bytes of token i in _tokens
+        _frequencies[i]                         the frequency of token i
+        _hashes[j]                              the 32 bit hashes of all tokens, in sorted order
+        _hash_tokens[j]                         the index of the token with hash _hashes[j]
+        _buckets[b]:_buckets[b+1]               the range of hashes whose highest bits are b
+
+    Together, the hashes and buckets form a hash table: a token is looked up by scanning the
+    (on average about one) hashes in its bucket, and comparing the token bytes to rule out
+    collisions. The arrays can be used directly from a memory-mapped file without building a
+    dictionary, and many tokens can be looked up at once using get_many.
+    """
+
+    def __init__(self, tokens, offsets, frequencies, hashes=None, hash_tokens=None, buckets=None):
+        """ Initialize using the (possibly memory-mapped) arrays, the hash table is built if not given """
+
+        self._tokens = tokens
+        self._offsets = offsets
+        self._frequencies = frequencies
+
+        if hashes is None or hash_tokens is None or buckets is None:
+            hashes, hash_tokens, buckets = self._hash_table()
+
+        self._hashes = hashes
+        self._hash_tokens = hash_tokens
+        self._buckets = buckets
+
+        # The bucket of a hash is given by its highest bits
+        self._bucket_shift = 32 - (len(self._buckets) - 1).bit_length() + 1
+
+        # Views used for vectorized lookups, without copying
+        self._bucket_array = np.frombuffer(self._buckets, dtype=np.uint32)
+        self._hash_array = np.frombuffer(self._hashes, dtype=np.uint32)
+        self._frequency_array = np.frombuffer(self._frequencies, dtype=np.int64)
+
+    @classmethod
+    def from_dict(cls, frequency_dict):
+        """ Initialize from a dictionary of token to frequency """
+
+        tokens = bytearray()
+        offsets = array('Q', [0])
+        frequencies = array('q')
+
+        for token in sorted(frequency_dict):
+            tokens += token.encode('utf-8')
+            offsets.append(len(tokens))
+            frequencies.append(int(frequency_dict[token]))
+
+        return cls(bytes(tokens), offsets, frequencies)
+
+    @classmethod
+    def from_csv(cls, path):
+        """ Initialize from a csv file with a token and a frequency column """
+
+        token_frequencies = pd.read_csv(path)
+        token_frequencies = token_frequencies[token_frequencies['token'].notnull()]
+
+        return cls.from_dict(dict(zip(token_frequencies['token'].astype(str),
+                                      token_frequencies['frequency'])))
+
+    def to_buffers(self):
+        """ Returns the arrays that fully describe this mapping """
+
+        return {'tokens': self._tokens,
+                'offsets': self._offsets,
+                'frequencies': self._frequencies,
+                'hashes': self._hashes,
+                'hash_tokens': self._hash_tokens,
+                'buckets': self._buckets}
+
+    @classmethod
+    def from_buffers(cls, buffers):
+        """ Initialize from the arrays returned by to_buffers """
+
+        return cls(buffers['tokens'], buffers['offsets'], buffers['frequencies'],
+                   buffers.get('hashes'), buffers.get('hash_tokens'), buffers.get('buckets'))
+
+    def save(self, path):
+        """ Write the arrays to a binary file, that can be memory-mapped using TokenFrequencies.load """
+
+        write_snapshot(path, {'type': 'token_frequencies'}, self.to_buffers())
+
+    @classmethod
+    def load(cls, path):
+        """ Initialize by memory-mapping a file written by save """
+
+        metadata, sections = read_snapshot(path)
+
+        if metadata.get('type') != 'token_frequencies':
+            raise ValueError("{} does not contain token frequencies".format(path))
+
+        return cls.from_buffers(sections)
+
+    def _hash_table(self):
+        """ Compute the sorted hashes, the index of the token of each hash, and the buckets """
+
+        token_hashes = np.array([_token_hash(self._token_bytes(i)) for i in range(len(self))],
+                                dtype=np.uint32)
+
+        hash_tokens = np.argsort(token_hashes, kind='stable')
+        token_hashes = token_hashes[hash_tokens]
+
+        # A power of two number of buckets, at least the number of tokens
+        bucket_bits = max(len(self) - 1, 1).bit_length()
+        bucket_starts = np.searchsorted(
+            token_hashes, np.arange(2 ** bucket_bits + 1, dtype=np.uint64) << (32 - bucket_bits))
+
+        return (array('I', token_hashes.tobytes()),
+                array('I', hash_tokens.astype(np.uint32).tobytes()),
+                array('I', bucket_starts.astype(np.uint32).tobytes()))
+
+    def _token_bytes(self, i):
+        return bytes(self._tokens[self._offsets[i]:self._offsets[i + 1]])
+
+    def _find(self, token):
+        """ Returns the index of the token, or -1 if it is not known """
+
+        if not isinstance(token, str):
+            return -1
+
+        token = token.encode('utf-8')
+        token_hash = _token_hash(token)
+        bucket = token_hash >> self._bucket_shift
+
+        return self._find_in_bucket(token, token_hash, self._buckets[bucket], self._buckets[bucket + 1])
+
+    def _find_in_bucket(self, token, token_hash, start, end):
+        """ Returns the index of the token, given the range of hashes of its bucket """
+
+        for j in range(start, end):
+
+            if self._hashes[j] == token_hash:
+
+                i = self._hash_tokens[j]
+
+                if self._token_bytes(i) == token:
+                    return i
+
+        return -1
+
+    def get_many(self, tokens, default=0):
+        """
+        Look up the frequencies of many tokens at once. The hash of each token is compared to the
+        hashes in its bucket with vectorized operations, only the tokens with an equal hash are
+        then compared byte by byte.
+
+        Arguments:
+            tokens (list) - The tokens
+            default (int) - The frequency of tokens that are not known
+
+        Returns:
+            An int64 numpy array with the frequency of each token
+        """
+
+        encoded_tokens = [token.encode('utf-8') for token in tokens]
+        token_hashes = np.array([_token_hash(token) for token in encoded_tokens], dtype=np.uint32)
+
+        buckets = token_hashes >> np.uint32(self._bucket_shift)
+        starts = self._bucket_array[buckets].astype(np.int64)
+        lengths = self._bucket_array[buckets + 1].astype(np.int64) - starts
+
+        # All (token, position) pairs of the hashes in the bucket of each token, as flat arrays
+        owners = np.repeat(np.arange(len(tokens)), lengths)
+        positions = np.arange(len(owners)) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+
+        # Only the bytes of tokens with an equal hash are compared, to rule out collisions
+        hits = self._hash_array[positions] == token_hashes[owners]
+
+        indices = np.full(len(tokens), -1, dtype=np.int64)
+
+        for (owner, position) in zip(owners[hits].tolist(), positions[hits].tolist()):
+
+            i = self._hash_tokens[position]
+
+            if indices[owner] < 0 and self._token_bytes(i) == encoded_tokens[owner]:
+                indices[owner] = i
+
+        known = indices >= 0
+
+        frequencies = np.full(len(tokens), default, dtype=np.int64)
+        frequencies[known] = self._frequency_array[indices[known]]
+
+        return frequencies
+
+    def __getitem__(self, token):
+
+        i = self._find(token)
+
+        if i < 0:
+            raise KeyError(token)
+
+        return self._frequencies[i]
+
+    def get(self, token, default=None):
+
+        i = self._find(token)
+
+        return self._frequencies[i] if i >= 0 else default
+
+    def __contains__(self, token):
+        return self._find(token) >= 0
+
+    def __len__(self):
+        return len(self._frequencies)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._token_bytes(i).decode('utf-8')
+
+    def items(self):
+        """ Iterate over (token, frequency) tuples without looking up each token """
+
+        return zip(self, self._frequencies)
+
+
+def load_token_frequencies(csv_path, binary_path=None):
+    """
+    Load the token frequencies from a binary file, which is memory-mapped. If the binary file does
+    not exist, is older than the csv file or was written by an older version, the csv file is read
+    instead, and the binary file is (re)written for the next time.
+
+    Arguments:
+        csv_path (str) - The path of the csv file with a token and a frequency column
+        binary_path (str) - The path of the binary file, by default the csv path with extension .bin
+
+    Returns:
+        TokenFrequencies
+    """
+
+    if binary_path is None:
+        binary_path = os.path.splitext(csv_path)[0] + '.bin'
+
+    if os.path.exists(binary_path) and \
+            (not os.path.exists(csv_path) or os.path.getmtime(binary_path) >= os.path.getmtime(csv_path)):
+        try:
+            return TokenFrequencies.load(binary_path)
+        except ValueError:
+            if not os.path.exists(csv_path):
+                raise
+
+    token_frequencies = TokenFrequencies.from_csv(csv_path)
+
+    # Write to a temporary file first, so that a partial file is never read
+    try:
+        temporary_path = "{}.{}.tmp".format(binary_path, os.getpid())
+        token_frequencies.save(temporary_path)
+        os.replace(temporary_path, binary_path)
+    except OSError:
+        pass
+
+    return token_frequencies
+
+
+def _token_hash(token_bytes):
+    """ A 32 bit hash of the encoded token, that is the same in every process """
+
+    return zlib.crc32(token_bytes)
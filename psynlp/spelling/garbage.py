@@ -0,0 +1,137 @@
+"""
+This module contains functionality for the GarbageFilter class.
+"""
+
+import collections
+import re
+
+# The reasons for which a token can be skipped
+GARBAGE_REASONS = ['too_long', 'too_short', 'few_letters', 'repeated_characters', 'pattern']
+
+# Urls and e-mail addresses
+DEFAULT_GARBAGE_PATTERN = r"://|^www\.|@"
+
+
+class GarbageFilter:
+    """
+    A cheap classifier of tokens for which searching candidates is useless: tokens that are too
+    long or too short for any word in the lexicon to be within the maximum edit distance, tokens
+    with few letters, tokens with long runs of a repeated character (zzzzz, ?????), and urls
+    or e-mail addresses. Such tokens are the most expensive queries of the EditDistTrie, and rarely
+    have a useful correction. Only the length bounds never skip a token that has candidates, the
+    other thresholds may skip tokens that would otherwise be corrected.
+
+    The number of skipped tokens is counted for each reason.
+    """
+
+    def __init__(self, min_length=None, max_length=None, length_margin=0, min_letter_ratio=0.5,
+                 max_repeated_characters=3, pattern=DEFAULT_GARBAGE_PATTERN):
+        """
+        Initialize using the thresholds, each can be None to disable it.
+
+        Arguments:
+            min_length (int) - Shorter tokens are skipped
+            max_length (int) - Longer tokens are skipped
+            length_margin (int) - The margin around the length of added words, see add_words
+            min_letter_ratio (float) - Tokens with a lower fraction of letters are skipped
+            max_repeated_characters (int) - Tokens with a longer run of one character are skipped
+            pattern (str) - Tokens that match this regular expression are skipped
+        """
+
+        self.min_length = min_length
+        self.max_length = max_length
+        self.length_margin = length_margin
+        self.min_letter_ratio = min_letter_ratio
+        self.max_repeated_characters = max_repeated_characters
+        self.pattern = pattern
+
+        self._pattern = re.compile(pattern) if pattern is not None else None
+
+        if max_repeated_characters is not None:
+            self._repeated_pattern = re.compile(r"(.)\1{%d}" % max_repeated_characters)
+        else:
+            self._repeated_pattern = None
+
+        self.counts = collections.Counter()
+
+    @classmethod
+    def from_length_bounds(cls, min_word_length, max_word_length, max_edit_distance, **kwargs):
+        """
+        Initialize with the length bounds of the lexicon: a token that differs more than
+        max_edit_distance in length from all words in the lexicon has no candidates. The bounds
+        can be None if the lexicon is empty.
+        """
+
+        if min_word_length is not None:
+            kwargs.setdefault('min_length', min_word_length - max_edit_distance)
+
+        if max_word_length is not None:
+            kwargs.setdefault('max_length', max_word_length + max_edit_distance)
+
+        return cls(length_margin=max_edit_distance, **kwargs)
+
+    @classmethod
+    def from_lexicon(cls, lexicon, max_edit_distance, **kwargs):
+        """ Initialize with the length bounds of the words in the lexicon, see from_length_bounds """
+
+        lengths = [len(word) for word in lexicon if len(word) > 0]
+
+        return cls.from_length_bounds(min(lengths, default=None), max(lengths, default=None),
+                                      max_edit_distance, **kwargs)
+
+    def reason(self, token):
+        """ Returns the reason to skip the token (see GARBAGE_REASONS), or None if it should be searched """
+
+        n = len(token)
+
+        if self.max_length is not None and n > self.max_length:
+            return 'too_long'
+
+        if self.min_length is not None and n < self.min_length:
+            return 'too_short'
+
+        if self.min_letter_ratio is not None and \
+                sum(character.isalpha() for character in token) < self.min_letter_ratio * n:
+            return 'few_letters'
+
+        if self._repeated_pattern is not None and self._repeated_pattern.search(token):
+            return 'repeated_characters'
+
+        if self._pattern is not None and self._pattern.search(token):
+            return 'pattern'
+
+        return None
+
+    def skip(self, token):
+        """ Whether the token should be skipped, which is counted """
+
+        reason = self.reason(token)
+
+        if reason is None:
+            return False
+
+        self.counts[reason] += 1
+
+        return True
+
+    def add_words(self, words):
+        """ Widen the length bounds, so that candidates of the added words are not skipped """
+
+        for word in words:
+            if self.min_length is not None:
+                self.min_length = min(self.min_length, len(word) - self.length_margin)
+            if self.max_length is not None:
+                self.max_length = max(self.max_length, len(word) + self.length_margin)
+
+    def remove_words(self, words):
+        """ The length bounds are not narrowed, which is only less strict """
+
+        pass
+
+    def skip_info(self):
+        """ Returns the number of skipped tokens for each reason """
+
+        return {reason: self.counts[reason] for reason in GARBAGE_REASONS}
+
+    def reset_counts(self):
+        self.counts.clear()
@@ -0,0 +1,150 @@
+"""
+This module contains functionality for the LexiconBuilder class, which determines in bulk which
+words of a vocabulary are added to the lexicon of a SpellChecker.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+
+import spacy
+import unidecode
+
+# The tokenizer of a worker process, see _init_worker
+_worker_tokenizer = None
+
+
+class LexiconBuilder:
+    """
+    Determines which words of a vocabulary are valid lexicon words, i.e. non-empty words that are
+    a single token, and normalizes them (lowercased, special characters remapped).
+
+    Rather than running the spacy pipeline on each word separately, only the tokenizer is used,
+    on batches of words and optionally in parallel. The result for a vocabulary is cached in a
+    file, keyed by a hash of the vocabulary and the tokenizer, so that building the lexicon from
+    the same resource files a second time does not need the tokenizer at all.
+    """
+
+    def __init__(self, nlp, cache_dir=None, n_jobs=1, batch_size=10000):
+        """
+        Initialize using the spacy model.
+
+        Arguments:
+            nlp (Language) - The spacy model, of which only the tokenizer is used
+            cache_dir (str) - The directory of the cache files, or None for no caching
+            n_jobs (int) - The number of processes used for tokenizing (None for number of cpus)
+            batch_size (int) - The number of words tokenized in one batch
+        """
+
+        self.tokenizer = nlp.tokenizer
+        self.cache_dir = cache_dir
+        self.n_jobs = n_jobs or multiprocessing.cpu_count()
+        self.batch_size = batch_size
+
+        # The tokenizer is identified by the model and its tokenizer settings
+        self._tokenizer_hash = hashlib.sha1(
+            "{}\n{}\n{}".format(spacy.__version__, nlp.meta.get('name'), nlp.meta.get('version'))
+            .encode('utf-8') + self.tokenizer.to_bytes()
+        ).hexdigest()
+
+    def lexicon_words(self, vocabulary_list, use_cache=True):
+        """
+        Returns the normalized words of the vocabulary that are valid lexicon words, in the
+        order of the vocabulary (duplicates are not removed).
+
+        Arguments:
+            vocabulary_list (list) - The words of the vocabulary
+            use_cache (bool) - Whether to read and write the cache, if a cache_dir is set
+        """
+
+        cache_path = self._cache_path(vocabulary_list) if use_cache else None
+
+        if cache_path is not None and os.path.exists(cache_path):
+            with open(cache_path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+
+        words = [word for word, single_token in zip(vocabulary_list,
+                                                    self._single_token_verdicts(vocabulary_list))
+                 if single_token]
+
+        lexicon_words = [unidecode.unidecode(word.lower()) for word in words]
+
+        if cache_path is not None:
+            self._write_cache(cache_path, lexicon_words)
+
+        return lexicon_words
+
+    def _single_token_verdicts(self, vocabulary_list):
+        """ Whether each word is non-empty and a single token """
+
+        # Empty words are never tokenized
+        words = [word for word in vocabulary_list if len(word) > 0]
+
+        if self.n_jobs == 1 or len(words) <= self.batch_size:
+            verdicts = _single_tokens(self.tokenizer, words, self.batch_size)
+        else:
+            verdicts = self._single_token_verdicts_parallel(words)
+
+        verdicts = iter(verdicts)
+
+        return [len(word) > 0 and next(verdicts) for word in vocabulary_list]
+
+    def _single_token_verdicts_parallel(self, words):
+        """ Tokenize the words in chunks, in n_jobs processes """
+
+        chunks = [words[i:i + self.batch_size] for i in range(0, len(words), self.batch_size)]
+
+        with multiprocessing.Pool(min(self.n_jobs, len(chunks)),
+                                  initializer=_init_worker,
+                                  initargs=(self.tokenizer, )) as pool:
+
+            verdicts = []
+
+            for chunk_verdicts in pool.imap(_single_tokens_worker, chunks):
+                verdicts.extend(chunk_verdicts)
+
+        return verdicts
+
+    def _cache_path(self, vocabulary_list):
+        """ The cache file of a vocabulary, or None when not caching """
+
+        if self.cache_dir is None:
+            return None
+
+        vocabulary_hash = hashlib.sha1(self._tokenizer_hash.encode('utf-8'))
+        vocabulary_hash.update("\n".join(vocabulary_list).encode('utf-8'))
+
+        return os.path.join(self.cache_dir, "lexicon_{}.json".format(vocabulary_hash.hexdigest()))
+
+    def _write_cache(self, cache_path, lexicon_words):
+        """ Write a cache file, without failing when the cache directory is not writable """
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            # Write to a temporary file first, so that a partial file is never read
+            temporary_path = "{}.{}.tmp".format(cache_path, os.getpid())
+
+            with open(temporary_path, 'w', encoding='utf-8') as file:
+                json.dump(lexicon_words, file, ensure_ascii=False)
+
+            os.replace(temporary_path, cache_path)
+
+        except OSError:
+            pass
+
+
+def _single_tokens(tokenizer, words, batch_size):
+    """ Whether each word is a single token """
+
+    return [len(doc) == 1 for doc in tokenizer.pipe(words, batch_size=batch_size)]
+
+
+def _init_worker(tokenizer):
+    global _worker_tokenizer
+    _worker_tokenizer = tokenizer
+
+
+def _single_tokens_worker(words):
+    return _single_tokens(_worker_tokenizer, words, len(words))
@@ -0,0 +1,260 @@
+"""
+This module contains functionality for the PhoneticCodes class.
+"""
+
+from array import array
+from bisect import bisect_left, insort
+from collections.abc import Sequence
+import heapq
+import sys
+
+from doublemetaphone import doublemetaphone
+
+
+class PhoneticCodes:
+    """
+    The (primary) double metaphone codes of all words in a lexicon, computed once. The words are
+    kept in sorted order, with their codes in a sequence of the same order. Codes are interned,
+    since many words share the same code. The words and codes can also be memory-mapped from a
+    snapshot (see to_buffers), in which case they are StringTables.
+
+    Words that are added afterwards are kept apart in a (small) dictionary, and removed words in a
+    set, so that the cost of adding or removing words is proportional to the number of words that
+    are added or removed, not to the size of the lexicon.
+
+    Optionally, an index from code to words is built, to find all words that sound alike:
+
+        _index_codes[c]                             the distinct codes, in sorted order
+        _index_starts[c]:_index_starts[c+1]         the range of _index_words with code c
+        _index_words[j]                             the position of a word in _words
+    """
+
+    def __init__(self, lexicon):
+        """ Initialize by computing the code of each word in the lexicon """
+
+        self._init_words(sorted(lexicon))
+        self._codes = [sys.intern(doublemetaphone(word)[0]) for word in self._words]
+
+    def _init_words(self, words):
+        """ Initialize with the sorted words, without any index or added or removed words """
+
+        self._words = words
+
+        self._index_codes = None
+        self._index_starts = None
+        self._index_words = None
+
+        self._added = {}
+        self._added_index = {}
+        self._removed = set()
+
+    @classmethod
+    def from_sorted(cls, words, codes):
+        """ Initialize from sorted words and their codes, without computing the codes """
+
+        phonetic_codes = cls.__new__(cls)
+
+        phonetic_codes._init_words(words)
+        phonetic_codes._codes = [sys.intern(code) for code in codes]
+
+        return phonetic_codes
+
+    def to_buffers(self):
+        """ Returns the arrays that fully describe the words, codes and index (with the words added and removed) """
+
+        phonetic_codes = self
+
+        if len(self._added) > 0 or len(self._removed) > 0:
+            items = list(self.items())
+            phonetic_codes = PhoneticCodes.from_sorted([word for (word, _) in items],
+                                                       [code for (_, code) in items])
+
+        if phonetic_codes._index_codes is None:
+            phonetic_codes.build_index()
+
+        buffers = {'index_starts': phonetic_codes._index_starts,
+                   'index_words': phonetic_codes._index_words}
+
+        for name, strings in [('words', phonetic_codes._words),
+                              ('codes', phonetic_codes._codes),
+                              ('index_codes', phonetic_codes._index_codes)]:
+            for key, buffer in StringTable.from_strings(strings).to_buffers().items():
+                buffers[name + "_" + key] = buffer
+
+        return buffers
+
+    @classmethod
+    def from_buffers(cls, buffers):
+        """ Initialize from the (possibly memory-mapped) arrays returned by to_buffers """
+
+        phonetic_codes = cls.__new__(cls)
+
+        phonetic_codes._init_words(StringTable(buffers['words_data'], buffers['words_offsets']))
+        phonetic_codes._codes = StringTable(buffers['codes_data'], buffers['codes_offsets'])
+
+        phonetic_codes._index_codes = StringTable(buffers['index_codes_data'], buffers['index_codes_offsets'])
+        phonetic_codes._index_starts = buffers['index_starts']
+        phonetic_codes._index_words = buffers['index_words']
+
+        return phonetic_codes
+
+    def get_codes(self):
+        """ Returns the codes, in the same order as the sorted words (with the words added and removed) """
+
+        if len(self._added) == 0 and len(self._removed) == 0:
+            return self._codes
+
+        return [code for (_, code) in self.items()]
+
+    def items(self):
+        """ Returns the words and their codes, as (word, code) tuples in sorted order """
+
+        words_and_codes = ((word, code) for (word, code) in zip(self._words, self._codes)
+                           if word not in self._removed)
+
+        return heapq.merge(words_and_codes, sorted(self._added.items()))
+
+    def _find(self, word):
+        """ The position of word in the sorted words of the lexicon, or None """
+
+        i = bisect_left(self._words, word)
+
+        if i < len(self._words) and self._words[i] == word:
+            return i
+
+        return None
+
+    def code(self, word):
+        """ Returns the code of a word, which is only computed if the word is not in the lexicon """
+
+        if word in self._added:
+            return self._added[word]
+
+        i = self._find(word)
+
+        if i is not None:
+            return self._codes[i]
+
+        return doublemetaphone(word)[0]
+
+    def codes(self, words):
+        """ Returns the codes of a list of words """
+
+        return [self.code(word) for word in words]
+
+    def add_words(self, words):
+        """ Add words to the lexicon, and to the index """
+
+        for word in words:
+
+            if word in self._removed:
+                self._removed.discard(word)
+                continue
+
+            if word in self._added or self._find(word) is not None:
+                continue
+
+            code = sys.intern(doublemetaphone(word)[0])
+
+            self._added[word] = code
+            insort(self._added_index.setdefault(code, []), word)
+
+    def remove_words(self, words):
+        """ Remove words from the lexicon and from the index """
+
+        for word in words:
+
+            if word in self._added:
+                code = self._added.pop(word)
+                self._added_index[code].remove(word)
+            elif self._find(word) is not None:
+                self._removed.add(word)
+
+    def build_index(self):
+        """ Build the index from code to words """
+
+        # Sorting is stable, so that the words with the same code remain in sorted order
+        positions = sorted(range(len(self._codes)), key=self._codes.__getitem__)
+
+        self._index_codes = []
+        self._index_starts = array('I')
+        self._index_words = array('I', positions)
+
+        for j, position in enumerate(positions):
+
+            code = self._codes[position]
+
+            if len(self._index_codes) == 0 or self._index_codes[-1] != code:
+                self._index_codes.append(code)
+                self._index_starts.append(j)
+
+        self._index_starts.append(len(positions))
+
+    def words_with_code(self, code):
+        """ Returns the words in the lexicon with the given code, in sorted order """
+
+        if self._index_codes is None:
+            self.build_index()
+
+        c = bisect_left(self._index_codes, code)
+
+        if c < len(self._index_codes) and self._index_codes[c] == code:
+            words = [self._words[position]
+                     for position in self._index_words[self._index_starts[c]:self._index_starts[c + 1]]]
+        else:
+            words = []
+
+        if len(self._removed) > 0:
+            words = [word for word in words if word not in self._removed]
+
+        if len(self._added_index.get(code, ())) > 0:
+            words = list(heapq.merge(words, self._added_index[code]))
+
+        return words
+
+
+class StringTable(Sequence):
+    """
+    A read-only sequence of strings, stored in flat arrays so that it can be used directly from a
+    memory-mapped file:
+
+        _data                               all strings utf-8 encoded and concatenated
+        _offsets[i]:_offsets[i+1]           the bytes of string i in _data
+
+    Strings are only decoded when they are accessed.
+    """
+
+    def __init__(self, data, offsets):
+        """ Initialize using the (possibly memory-mapped) arrays """
+
+        self._data = data
+        self._offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        """ Initialize from a sequence of strings """
+
+        data = bytearray()
+        offsets = array('Q', [0])
+
+        for string in strings:
+            data += string.encode('utf-8')
+            offsets.append(len(data))
+
+        return cls(bytes(data), offsets)
+
+    def to_buffers(self):
+        """ Returns the arrays that fully describe this table """
+
+        return {'data': self._data,
+                'offsets': self._offsets}
+
+    def __getitem__(self, i):
+
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+
+        return str(self._data[self._offsets[i]:self._offsets[i + 1]], 'utf-8')
+
+    def __len__(self):
+        return len(self._offsets) - 1
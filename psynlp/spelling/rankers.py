@@ -1,11 +1,15 @@
-from nltk import edit_distance
 from doublemetaphone import doublemetaphone
 
 from gensim.models import Word2Vec
 
+import functools
 import numpy as np
-import pandas as pd
+import os
 
+from psynlp.spelling.editdistance import edit_distances
+from psynlp.spelling.embeddings import WordEmbeddings
+from psynlp.spelling.frequencies import TokenFrequencies, load_token_frequencies
+from psynlp.spelling.phonetic import PhoneticCodes
 from psynlp.utils import get_global_resource
 
 from abc import ABC, abstractmethod
@@ -13,6 +17,10 @@ from abc import ABC, abstractmethod
 
 class Ranker(ABC):
 
+    # Whether the ranker uses the context of a misspelling. If not, the SpellChecker ranks each
+    # unique misspelling only once when correcting many texts.
+    uses_context = True
+
     def __init__(self):
         self.optimum_func = None
 
@@ -28,6 +36,21 @@ class Ranker(ABC):
 
         return best_tup[0]
 
+    def best_candidates(self, misspellings):
+        """
+        Determines the best candidate for a number of misspellings at once. Rankers can override
+        this to score all misspellings together.
+
+        Args:
+            misspellings [(misspelled_word:str, candidates:[(str, int)], context:[str])]
+
+        Returns:
+            A list with the best candidate (or None) for each misspelling
+        """
+
+        return [self.best_candidate(misspelled_word, candidates, context)
+                for (misspelled_word, candidates, context) in misspellings]
+
     @abstractmethod
     def score_candidates(self, misspelled_word, candidates, context):
         """
@@ -51,105 +74,191 @@ class NoisyRanker(Ranker):
     Taken (and adapted) from: https://github.com/clips/clinspell/blob/master/code/ranking_experiments.py
     """
 
-    def __init__(self):
+    uses_context = False
+
+    def __init__(self, token_frequencies=None, phonetic_codes=None):
+        """
+        Initialize using the token frequencies (a TokenFrequencies object, or a dictionary from
+        token to frequency). If not given, the token frequencies are loaded from
+        token_frequencies.csv in the global resource folder (see load_token_frequencies), but
+        normally the TokenFrequencies of the SpellChecker are shared.
+
+        The phonetic codes (a PhoneticCodes object) of the words in the lexicon can be computed
+        beforehand, otherwise they are computed for each candidate.
+        """
+
+        if token_frequencies is None:
+            token_frequencies = load_token_frequencies(
+                get_global_resource('token_frequencies.csv'))
+        elif not isinstance(token_frequencies, TokenFrequencies):
+            token_frequencies = TokenFrequencies.from_dict(token_frequencies)
 
-        token_frequencies = pd.read_csv(
-            get_global_resource('token_frequencies.csv'))
+        if phonetic_codes is None:
+            phonetic_codes = PhoneticCodes([])
 
-        self.frequency_dict = dict(
-            zip(token_frequencies['token'], token_frequencies['frequency']))
+        self.frequency_dict = token_frequencies
+        self.phonetic_codes = phonetic_codes
 
         self.optimum_func = min
 
     def score_candidates(self, misspelled_word, candidates, context):
 
-        rank_words = []
-        rank_scores = []
+        if len(candidates) == 0:
+            return []
 
-        # Iterate over candidates, edit distances already computed when generating candidates
-        for (candidate, orthographic_edit_distance) in candidates:
+        rank_words = [candidate for (candidate, _) in candidates]
 
-            # Compute phonetic edit distance using the double metaphone algorithm
-            phonetic_edit_distance = edit_distance(doublemetaphone(misspelled_word)[0],
-                                                   doublemetaphone(candidate)[0])
+        # Edit distances already computed when generating candidates
+        orthographic_edit_distances = np.array([orthographic_edit_distance
+                                                for (_, orthographic_edit_distance) in candidates])
 
-            # Compute spell score
-            spell_score = (2 * orthographic_edit_distance +
-                           phonetic_edit_distance) ** 2  # P(m|c)
+        # Compute phonetic edit distance using the double metaphone algorithm
+        misspelled_code = doublemetaphone(misspelled_word)[0]
 
-            # Try to find the frequency, or assume frequency of 1 if not known word
-            try:
-                frequency = self.frequency_dict[candidate]
-            except KeyError:
-                frequency = 1
+        phonetic_edit_distances = np.array(edit_distances(misspelled_code,
+                                                          self.phonetic_codes.codes(rank_words)))
 
-            # Compute score
-            frequency_score = 1 / (1 + np.log(frequency))  # P(c)
-            score = spell_score * frequency_score  # P(c|m) = P(m|c)*P(c)
+        # Try to find the frequency, or assume frequency of 1 if not known word
+        frequencies = self.frequency_dict.get_many(rank_words, default=1).astype(np.float64)
 
-            # Store word and score
-            rank_words.append(candidate)
-            rank_scores.append(score)
+        # Compute scores for all candidates at once
+        spell_scores = (2 * orthographic_edit_distances + phonetic_edit_distances) ** 2  # P(m|c)
+        frequency_scores = 1 / (1 + np.log(frequencies))  # P(c)
+        rank_scores = spell_scores * frequency_scores  # P(c|m) = P(m|c)*P(c)
 
         # Return as a list of tuples (candidate, score)
-        return list(zip(rank_words, rank_scores))
+        return list(zip(rank_words, rank_scores.tolist()))
 
 
 class EmbeddingRanker(Ranker):
     """
-    Ranks based on word embeddings
+    Ranks based on word embeddings: the probability of the candidate given the (averaged) context
+    vectors, divided by the edit distance.
     """
 
-    def __init__(self):
-        """ Initialize by loading the word2vec model """
+    def __init__(self, normalizer_cache_size=1024, embeddings_path=None):
+        """
+        Initialize by loading the word2vec arrays.
+
+        Arguments:
+            normalizer_cache_size (int) - The number of contexts for which the normalizer is cached
+            embeddings_path (str) - The path of the arrays written by export_word2vec, which are
+                memory-mapped. By default gensim/word2vec.arrays is used if it exists, and
+                otherwise the full gensim/word2vec.model is loaded.
+        """
+
+        if embeddings_path is None and os.path.exists(get_global_resource('gensim/word2vec.arrays')):
+            embeddings_path = get_global_resource('gensim/word2vec.arrays')
+
+        if embeddings_path is not None:
+            embeddings = WordEmbeddings.load(embeddings_path)
+        else:
+            embeddings = WordEmbeddings.from_model(
+                Word2Vec.load(get_global_resource('gensim/word2vec.model')))
+
+        self.word2idx = embeddings.word2idx
+        self.vectors = embeddings.vectors
+        self.output_weights = embeddings.output_weights
 
-        self.w2v_model = Word2Vec.load(
-            get_global_resource('gensim/word2vec.model'))
         self.optimum_func = max
 
-    def score_candidates(self, misspelled_word, candidates, context):
+        # The normalizer of the softmax only depends on the context, and is cached
+        self._normalizer = functools.lru_cache(
+            maxsize=normalizer_cache_size)(self._compute_normalizer)
+
+    def _context_indices(self, context):
+        """ The unique indices of the context words in the vocabulary, as a tuple """
+
+        return tuple(dict.fromkeys(self.word2idx[context_word] for context_word in context
+                                   if context_word in self.word2idx))
+
+    def _context_vector(self, context_indices):
+        """ The composed (i.e. averaged) vector of the context words """
 
-        # Empty lists
-        rank_words = []
-        rank_scores = []
+        if len(context_indices) == 0:
+            return np.zeros(self.vectors.shape[1], dtype=self.vectors.dtype)
 
-        # Map words to word2vec id and to distance
-        word2idx_context = {}
-        word2idx_candidates = {}
-        word2dist = {}
+        return np.sum(self.vectors[list(context_indices)], axis=0) / len(context_indices)
 
-        # Iterate over words in the context
-        for context_word in context:
-            if context_word in self.w2v_model.wv:
-                word2idx_context[context_word] = self.w2v_model.wv.vocab[context_word].index
+    def _compute_normalizer(self, context_indices):
+        """ The sum of the unnormalized probabilities of all words in the vocabulary """
+
+        return np.sum(np.exp(np.dot(self.output_weights, self._context_vector(context_indices))))
+
+    def _candidate_indices(self, candidates):
+        """ The candidates that are in the vocabulary, with their indices and edit distances """
+
+        candidate_words = {}
 
-        # Iterate over candidates
         for candidate_word, distance in candidates:
-            if candidate_word in self.w2v_model.wv:
-                word2idx_candidates[candidate_word] = self.w2v_model.wv.vocab[candidate_word].index
-                word2dist[candidate_word] = distance
+            if candidate_word in self.word2idx:
+                candidate_words[candidate_word] = (self.word2idx[candidate_word], distance)
+
+        words = list(candidate_words.keys())
+        indices = np.array([index for (index, _) in candidate_words.values()], dtype=np.int64)
+        distances = np.array([distance for (_, distance) in candidate_words.values()], dtype=np.float64)
+
+        return words, indices, distances
+
+    def score_candidates(self, misspelled_word, candidates, context):
 
-        # Obtain context vectors
-        context_vectors = self.w2v_model.wv.vectors[list(
-            word2idx_context.values())]
+        words, indices, distances = self._candidate_indices(candidates)
 
-        # Compute probability values
-        composed_vector = np.sum(context_vectors, axis=0) / \
-            len(word2idx_context.keys())
-        prob_values = np.exp(
-            np.dot(composed_vector, self.w2v_model.trainables.syn1neg.T))
-        prob_values /= sum(prob_values)
+        if len(words) == 0:
+            return []
 
-        # For each candidate
-        for candidate_word in word2idx_candidates.keys():
+        context_indices = self._context_indices(context)
 
-            # Normalize by dividing over edit distance
-            score = prob_values[word2idx_candidates[candidate_word]
-                                ] / word2dist[candidate_word]
+        # Only compute the probabilities of the candidates, using the cached normalizer
+        logits = np.dot(self.output_weights[indices], self._context_vector(context_indices))
+        prob_values = np.exp(logits) / self._normalizer(context_indices)
 
-            # Append to lists
-            rank_words.append(candidate_word)
-            rank_scores.append(score)
+        # Normalize by dividing over edit distance
+        with np.errstate(divide='ignore'):
+            rank_scores = prob_values / distances
 
         # Return as a list of tupes (candidate, score)
-        return list(zip(rank_words, rank_scores))
+        return list(zip(words, rank_scores.tolist()))
+
+    def best_candidate(self, misspelled_word, candidates, context):
+
+        return self.best_candidates([(misspelled_word, candidates, context)])[0]
+
+    def best_candidates(self, misspellings):
+        """
+        Determines the best candidate for a number of misspellings at once, using a single matrix
+        multiplication of all context vectors with the output weights of all candidates. Since the
+        normalizer of the softmax does not change the order of the candidates, it is not computed.
+        """
+
+        candidate_indices = [self._candidate_indices(candidates) for (_, candidates, _) in misspellings]
+
+        # The candidates of all misspellings, and the context vector of each misspelling
+        all_indices = np.unique(np.concatenate(
+            [np.zeros(0, dtype=np.int64)] + [indices for (_, indices, _) in candidate_indices]))
+
+        if len(all_indices) == 0:
+            return [None] * len(misspellings)
+
+        context_vectors = np.array([self._context_vector(self._context_indices(context))
+                                    for (_, _, context) in misspellings])
+
+        # Logits of shape (number of misspellings, number of unique candidates)
+        logits = np.dot(context_vectors, self.output_weights[all_indices].T)
+
+        best_candidates = []
+
+        for i, (words, indices, distances) in enumerate(candidate_indices):
+
+            if len(words) == 0:
+                best_candidates.append(None)
+                continue
+
+            # The order of exp(logit) / distance is the same as that of logit - log(distance)
+            with np.errstate(divide='ignore'):
+                scores = logits[i, np.searchsorted(all_indices, indices)] - np.log(distances)
+
+            best_candidates.append(words[int(np.argmax(scores))])
+
+        return best_candidates
+
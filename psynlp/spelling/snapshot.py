@@ -0,0 +1,110 @@
+"""
+This module contains functionality for writing and reading snapshots: single binary files
+that contain a number of named arrays, and that are read by memory-mapping the file.
+
+Layout of a snapshot file:
+
+    MAGIC (8 bytes)
+    length of the header (8 bytes, little endian)
+    header (json, utf-8 encoded), with the metadata and the offset, size and typecode of each array
+    the arrays, each aligned to 8 bytes
+"""
+
+import json
+import mmap
+import struct
+import sys
+
+MAGIC = b"PSYNLPSS"
+VERSION = 2
+
+_ALIGNMENT = 8
+
+
+def _typecode(buffer):
+    """ Determine the typecode of an array, bytes are stored as unsigned chars """
+
+    if isinstance(buffer, (bytes, bytearray)):
+        return 'B'
+
+    return memoryview(buffer).format
+
+
+def write_snapshot(path, metadata, sections):
+    """
+    Write a snapshot file.
+
+    Arguments:
+        path (str) - The path of the snapshot file
+        metadata (dict) - Json serializable metadata
+        sections (dict) - A dictionary from name to array (array.array, bytes or memoryview)
+    """
+
+    if sys.byteorder != 'little':
+        raise ValueError("Snapshots can only be written on little endian platforms")
+
+    header = {'version': VERSION,
+              'metadata': metadata,
+              'sections': {}
+              }
+
+    # Determine offsets relative to the start of the data
+    offset = 0
+
+    for name, buffer in sections.items():
+
+        nbytes = memoryview(buffer).nbytes
+        header['sections'][name] = (offset, nbytes, _typecode(buffer))
+        offset += nbytes + (-nbytes % _ALIGNMENT)
+
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = len(MAGIC) + 8 + len(header_bytes)
+    data_start += -data_start % _ALIGNMENT
+
+    with open(path, 'wb') as file:
+
+        file.write(MAGIC)
+        file.write(struct.pack('<Q', len(header_bytes)))
+        file.write(header_bytes)
+        file.write(b"\0" * (data_start - file.tell()))
+
+        for name, buffer in sections.items():
+
+            file.write(memoryview(buffer).cast('B'))
+            file.write(b"\0" * (-file.tell() % _ALIGNMENT))
+
+
+def read_snapshot(path):
+    """
+    Read a snapshot file by memory-mapping it, the arrays are not copied.
+
+    Arguments:
+        path (str) - The path of the snapshot file
+
+    Returns:
+        A tuple (metadata:dict, sections:dict), where sections maps a name to a read-only memoryview
+    """
+
+    with open(path, 'rb') as file:
+        mapped_file = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if mapped_file[:len(MAGIC)] != MAGIC:
+        raise ValueError("{} is not a snapshot file".format(path))
+
+    (header_length, ) = struct.unpack('<Q', mapped_file[len(MAGIC):len(MAGIC) + 8])
+    header = json.loads(mapped_file[len(MAGIC) + 8:len(MAGIC) + 8 + header_length].decode('utf-8'))
+
+    if header['version'] != VERSION:
+        raise ValueError("Snapshot version {} is not supported (expected {})".format(
+            header['version'], VERSION))
+
+    data_start = len(MAGIC) + 8 + header_length
+    data_start += -data_start % _ALIGNMENT
+
+    data = memoryview(mapped_file)
+    sections = {}
+
+    for name, (offset, nbytes, typecode) in header['sections'].items():
+        sections[name] = data[data_start + offset:data_start + offset + nbytes].cast(typecode)
+
+    return header['metadata'], sections
@@ -1,16 +1,39 @@
-import pandas as pd
-
 import spacy
+import collections.abc
+import functools
+import gc
 import glob
+import multiprocessing
 import os
 import re
+import tempfile
+import time
 import unidecode
 
-from psynlp.spelling.editdisttrie import EditDistTrie
+from doublemetaphone import doublemetaphone
+
+from psynlp.spelling.compounds import CompoundSplitter
+from psynlp.spelling.editdistance import edit_distances
+from psynlp.spelling.editdisttrie import EditDistTrie, EditDistTrieOverlay, ShardedEditDistTrie
+from psynlp.spelling.frequencies import TokenFrequencies, load_token_frequencies
+from psynlp.spelling.garbage import GarbageFilter
+from psynlp.spelling.lexicon import LexiconBuilder
+from psynlp.spelling.phonetic import PhoneticCodes
 from psynlp.spelling.rankers import NoisyRanker, EmbeddingRanker
+from psynlp.spelling.snapshot import write_snapshot, read_snapshot
+from psynlp.spelling.symspell import SymSpellIndex
 from psynlp.utils import get_global_resource, get_local_resource
 
 KNOWN_RANKERS = ['noisy', 'embedding']
+KNOWN_CANDIDATE_GENERATORS = ['trie', 'symspell']
+
+# The degradations that SpellChecker.correct can apply to meet a budget, and the number of
+# candidates that are searched when the budget is nearly used up
+BUDGET_DEGRADATIONS = ['reduced_edit_distance', 'reduced_candidates', 'skipped']
+BUDGET_MAX_CANDIDATES = 5
+
+# The SpellChecker used by the worker processes of SpellChecker.correct_parallel
+_worker_spell_checker = None
 
 
 class SpellChecker:
@@ -20,24 +43,230 @@ class SpellChecker:
                  frequency_threshold=50,
                  use_ranker="noisy",
                  many_texts=False,
+                 candidate_generator="trie",
+                 max_candidates=None,
+                 max_edit_distance=2,
+                 phonetic_candidates=False,
+                 phonetic_max_edit_distance=3,
+                 max_compound_parts=2,
+                 skip_garbage=False,
+                 misspelling_cache_size=65536,
+                 candidate_cache_size=16384,
+                 lexicon_cache=True,
+                 lexicon_n_jobs=1,
+                 n_jobs=1,
                  verbose=False):
 
         self.verbose = verbose
         self.frequency_threshold = frequency_threshold
         self.many_texts = many_texts
+        self.candidate_generator = candidate_generator
+        self.max_candidates = max_candidates
+        self.max_edit_distance = max_edit_distance
+        self.phonetic_candidates = phonetic_candidates
+        self.phonetic_max_edit_distance = phonetic_max_edit_distance
+        self.max_compound_parts = max_compound_parts
+        self.skip_garbage = skip_garbage
+        self.n_jobs = n_jobs
+
+        if candidate_generator not in KNOWN_CANDIDATE_GENERATORS:
+            raise ValueError("Unknown candidate generator specified ({}), choose from: {}".format(
+                candidate_generator, KNOWN_CANDIDATE_GENERATORS))
 
         # tokenizer
         self._init_tokenizer(spacy_model)
 
         # lexicon
-        self._init_lexicon()
+        self._init_lexicon(lexicon_cache, lexicon_n_jobs)
+
+        # phonetic codes
+        self._init_phonetic_codes()
+
+        # tries or symspell index
+        if candidate_generator == "symspell":
+            self._init_symspell()
+        else:
+            self._init_tries()
 
-        # tries
-        self._init_tries()
+        # compound splitter
+        self._init_compound_splitter()
+
+        # garbage filter
+        self._init_garbage_filter()
 
         # ranker
         self._init_ranker(use_ranker)
 
+        # caches
+        self._init_caches(misspelling_cache_size, candidate_cache_size)
+
+        # not initialized from a snapshot
+        self._snapshot_path = None
+
+    @classmethod
+    def from_snapshot(cls, path, spacy_model, use_ranker="noisy", candidate_generator="trie",
+                      max_candidates=None, max_edit_distance=2, phonetic_candidates=False,
+                      phonetic_max_edit_distance=3, max_compound_parts=2, skip_garbage=False,
+                      misspelling_cache_size=65536, candidate_cache_size=16384, n_jobs=1, verbose=False):
+        """
+        Initialize from a snapshot written by save_snapshot. The lexicon (the trie), phonetic codes,
+        token frequencies and compound index are memory-mapped from the snapshot file rather than
+        rebuilt, so that initialization is fast and processes on the same host share the memory pages.
+
+        Arguments:
+            path (str) - The path of the snapshot file
+            spacy_model (str) - The name of the spacy model, see __init__
+            use_ranker (str) - The ranker to be used, see __init__
+            candidate_generator (str) - The candidate generator to be used, see __init__. The
+                symspell index is not included in the snapshot, and is built after loading.
+            max_candidates (int) - The maximum number of candidates to rank, see __init__
+            max_edit_distance (int) - The maximum edit distance of candidates, see __init__
+            phonetic_candidates (bool) - Whether to add phonetic candidates, see __init__
+            phonetic_max_edit_distance (int) - The maximum edit distance of phonetic candidates, see __init__
+            max_compound_parts (int) - The maximum number of parts of a compound, see __init__
+            skip_garbage (bool) - Whether to skip searching candidates of garbage tokens, see __init__
+            misspelling_cache_size (int) - The size of the misspelling cache, see __init__
+            candidate_cache_size (int) - The size of the candidate cache, see __init__
+            n_jobs (int) - The number of processes used to rebuild the tries, see __init__
+            verbose (bool) - Verbosity
+        """
+
+        if candidate_generator not in KNOWN_CANDIDATE_GENERATORS:
+            raise ValueError("Unknown candidate generator specified ({}), choose from: {}".format(
+                candidate_generator, KNOWN_CANDIDATE_GENERATORS))
+
+        spell_checker = cls.__new__(cls)
+
+        spell_checker.verbose = verbose
+        spell_checker.candidate_generator = candidate_generator
+        spell_checker.max_candidates = max_candidates
+        spell_checker.max_edit_distance = max_edit_distance
+        spell_checker.phonetic_candidates = phonetic_candidates
+        spell_checker.phonetic_max_edit_distance = phonetic_max_edit_distance
+        spell_checker.max_compound_parts = max_compound_parts
+        spell_checker.skip_garbage = skip_garbage
+        spell_checker.n_jobs = n_jobs
+
+        # tokenizer
+        spell_checker._init_tokenizer(spacy_model)
+
+        # lexicon and tries
+        spell_checker._load_snapshot(path)
+
+        if candidate_generator == "symspell":
+            spell_checker._init_symspell()
+
+        # garbage filter
+        spell_checker._init_garbage_filter()
+
+        # ranker
+        spell_checker._init_ranker(use_ranker)
+
+        # caches
+        spell_checker._init_caches(misspelling_cache_size, candidate_cache_size)
+
+        return spell_checker
+
+    def save_snapshot(self, path):
+        """
+        Write the lexicon (the trie), phonetic codes, token frequencies and compound index to a single
+        binary file, that can be loaded using SpellChecker.from_snapshot.
+
+        Arguments:
+            path (str) - The path of the snapshot file
+        """
+
+        if self.verbose:
+            print("\n", "=== Writing snapshot to {} ===".format(path))
+
+        # Words added or removed through add_vocab or remove_vocab are only in the overlays of
+        # the tries, so these are rebuilt first
+        if self.compound_splitter.prefix_index.has_changes() or \
+                self.compound_splitter.suffix_index.has_changes():
+            if self.candidate_generator == "trie":
+                self._init_tries()
+            self._init_compound_splitter()
+
+        # The symspell index is not included, it is rebuilt from the lexicon after loading. The
+        # prefix index of the compound splitter (a single trie of the lexicon) is stored instead
+        # of the match trie.
+        if self.candidate_generator == "symspell":
+            match_trie = self.compound_splitter.prefix_index
+            many_texts = False
+        else:
+            match_trie = self.match_trie
+            many_texts = self.many_texts
+
+        sections = {}
+
+        for name, buffer in self.phonetic_codes.to_buffers().items():
+            sections['phonetic_codes_' + name] = buffer
+
+        for name, buffer in self.token_freq_dict.to_buffers().items():
+            sections['token_frequencies_' + name] = buffer
+
+        for name, buffer in match_trie.to_buffers().items():
+            sections['match_trie_' + name] = buffer
+
+        # The prefix index of the compound splitter is the match trie, unless it is sharded
+        if many_texts:
+            for name, buffer in self.compound_splitter.prefix_index.to_buffers().items():
+                sections['compound_prefix_index_' + name] = buffer
+
+        for name, buffer in self.compound_splitter.suffix_index.to_buffers().items():
+            sections['compound_suffix_index_' + name] = buffer
+
+        metadata = {'frequency_threshold': self.frequency_threshold,
+                    'many_texts': many_texts}
+
+        write_snapshot(path, metadata, sections)
+
+    def _load_snapshot(self, path):
+
+        if self.verbose:
+            print("\n", "=== Loading snapshot from {} ===".format(path))
+
+        metadata, sections = read_snapshot(path)
+
+        self._snapshot_path = os.path.abspath(path)
+
+        self.frequency_threshold = metadata['frequency_threshold']
+        self.many_texts = metadata['many_texts']
+
+        # Used when adding vocabulary
+        self._lexicon_builder = LexiconBuilder(self.nlp)
+
+        self.phonetic_codes = PhoneticCodes.from_buffers(
+            _sections_with_prefix(sections, 'phonetic_codes_'))
+
+        self.token_freq_dict = TokenFrequencies.from_buffers(
+            _sections_with_prefix(sections, 'token_frequencies_'))
+
+        if self.many_texts:
+            self.match_trie = EditDistTrieOverlay(ShardedEditDistTrie.from_buffers(
+                _sections_with_prefix(sections, 'match_trie_')))
+        else:
+            self.match_trie = EditDistTrieOverlay(EditDistTrie.from_buffers(
+                _sections_with_prefix(sections, 'match_trie_')))
+
+        if self.many_texts:
+            prefix_index = EditDistTrieOverlay(EditDistTrie.from_buffers(
+                _sections_with_prefix(sections, 'compound_prefix_index_')))
+        else:
+            prefix_index = self.match_trie
+
+        self.compound_splitter = CompoundSplitter(
+            prefix_index,
+            EditDistTrieOverlay(EditDistTrie.from_buffers(
+                _sections_with_prefix(sections, 'compound_suffix_index_'))),
+            max_parts=self.max_compound_parts)
+
+        # The lexicon is the prefix index of the compound splitter, see _init_compound_splitter
+        self.lexicon = prefix_index
+
+        if self.verbose:
+            print("> Lexicon size = {}".format(len(self.lexicon)))
+
     def _init_tokenizer(self, spacy_model):
         if self.verbose:
             print("", "=== Initializing spacy tokenizer ===")
@@ -46,15 +275,26 @@ class SpellChecker:
             os.path.join('spacy', spacy_model))
         
         nlp = spacy.load(nlp_model_path)
+        self.nlp = nlp
+        self.spacy_model = spacy_model
         self.tokenize = lambda x: nlp(x, disable=['tagger', 'parser', 'ner'])
+        self.tokenize_many = lambda x, batch_size: nlp.pipe(x,
+                                                            batch_size=batch_size,
+                                                            disable=['tagger', 'parser', 'ner'])
 
-    def _init_lexicon(self):
+    def _init_lexicon(self, lexicon_cache=True, lexicon_n_jobs=1):
 
         if self.verbose:
             print("\n", "=== Initializing lexicon ===")
 
         self.lexicon = set([])
 
+        # Checks the words of each resource file in bulk, and caches the result
+        self._lexicon_builder = LexiconBuilder(
+            self.nlp,
+            cache_dir=get_global_resource('lexicon_cache') if lexicon_cache else None,
+            n_jobs=lexicon_n_jobs)
+
         # Initialize by reading all files in lexicons/*.txt and adding to the lexicon
         lexicon_path = get_local_resource('lexicons')
 
@@ -67,63 +307,104 @@ class SpellChecker:
                 print("> Adding {} words to lexicon from {}".format(
                     len(words), path))
 
-            self._add_vocab_to_lexicon(words)
+            self._add_vocab_to_lexicon(words, use_cache=True)
 
-        token_frequencies = pd.read_csv(
+        # Also used by the NoisyRanker, so that the token frequencies are only loaded once
+        self.token_freq_dict = load_token_frequencies(
             get_global_resource('token_frequencies.csv'))
 
-        token_frequencies = token_frequencies[token_frequencies['token'].notnull()]
-
-        self.token_freq_dict = dict(
-            zip(token_frequencies['token'], token_frequencies['frequency']))
-
         # Add frequent tokens to the lexicon
-        token_frequencies = token_frequencies[token_frequencies['frequency'] > self.frequency_threshold]
-        frequent_tokens = list(token_frequencies['token'])
+        frequent_tokens = [token for token, frequency in self.token_freq_dict.items()
+                           if frequency > self.frequency_threshold]
 
         if self.verbose:
             print("> Adding {} frequent tokens to lexicon (threshold={})".format(
                 len(frequent_tokens), self.frequency_threshold))
 
-        self._add_vocab_to_lexicon(frequent_tokens)
+        self._add_vocab_to_lexicon(frequent_tokens, use_cache=True)
 
-    def _add_vocab_to_lexicon(self, vocabulary_list):
-        # Add a list of vocabulary to the lexicon
+    def _add_vocab_to_lexicon(self, vocabulary_list, use_cache=False):
+        # Add a list of vocabulary to the lexicon, only the non-empty words that are a single
+        # token are added after lowercasing and remapping special characters
+        self.lexicon.update(self._lexicon_builder.lexicon_words(vocabulary_list, use_cache))
 
-        # Iterate over words
-        for word in vocabulary_list:
-
-            # If not empty
-            if (len(word) > 0) and len(self.tokenize(word)) == 1:
+        if self.verbose:
+            print("> Lexicon size = {}".format(len(self.lexicon)))
 
-                # Add after lowercasing and remapping special characters
-                self.lexicon.add(unidecode.unidecode(word.lower()))
+    def _init_phonetic_codes(self):
+        # Compute the phonetic code of each word in the lexicon once, used by the NoisyRanker
 
         if self.verbose:
-            print("> Lexicon size = {}".format(len(self.lexicon)))
+            print("\n", "=== Initializing phonetic codes ===")
+
+        self.phonetic_codes = PhoneticCodes(self.lexicon)
+
+        if self.phonetic_candidates:
+            self.phonetic_codes.build_index()
 
     def _init_tries(self):
-        # Initialize a single trie (if many_texts == False) or else multiple tries
+        # Initialize a single trie (if many_texts == False) or else one trie per word length.
+        # Words can be added and removed afterwards through the overlay.
 
         if self.verbose:
             print("\n", "=== Initializing EditDistTrie ===")
 
-        # Case where many texsts are to be corrected
+        # Case where many texts are to be corrected
         if self.many_texts:
+            self.match_trie = EditDistTrieOverlay(ShardedEditDistTrie(self.lexicon, n_jobs=self.n_jobs))
 
-            self.match_tries = {}
+        # Otherwise only one trie is needed
+        else:
+            self.match_trie = EditDistTrieOverlay(EditDistTrie(self.lexicon))
 
-            # Min and max length
-            min_len = min([len(word) for word in self.lexicon])
-            max_len = max([len(word) for word in self.lexicon]) + 1
+    def _init_compound_splitter(self):
+        # Initialize the prefix and suffix index of the lexicon used to split compounds. The
+        # single trie (if many_texts == False) is used as the prefix index.
 
-            # Init trie(i) with words of length in range <i-2, i+2>
-            for i in range(min_len, max_len):
-                self.tries[i] = EditDistTrie([word for word in self.lexicon if abs(len(word) - i) <= 2])
+        if self.verbose:
+            print("\n", "=== Initializing CompoundSplitter ===")
 
-        # Otherwise only one trie is needed
+        if self.candidate_generator == "trie" and not self.many_texts:
+            prefix_index = self.match_trie
+        else:
+            prefix_index = None
+
+        self.compound_splitter = CompoundSplitter.from_lexicon(
+            self.lexicon, prefix_index=prefix_index, max_parts=self.max_compound_parts)
+
+        # The prefix index is a trie of the lexicon, which replaces the set of words. Membership is
+        # then a walk down the trie, which is memory-mapped when loading a snapshot.
+        self.lexicon = self.compound_splitter.prefix_index
+
+    def _init_garbage_filter(self):
+        # Initialize the classifier of tokens for which no candidates are searched. The length
+        # bounds of the lexicon never skip a token that has candidates, so they are always used,
+        # the other heuristics only if skip_garbage is set
+
+        max_edit_distance = self.max_edit_distance
+
+        if self.phonetic_candidates:
+            max_edit_distance = max(max_edit_distance, self.phonetic_max_edit_distance)
+
+        min_word_length, max_word_length = self.lexicon.length_bounds()
+
+        if self.skip_garbage:
+            self.garbage_filter = GarbageFilter.from_length_bounds(min_word_length, max_word_length,
+                                                                   max_edit_distance)
         else:
-            self.match_trie = EditDistTrie(self.lexicon)
+            self.garbage_filter = GarbageFilter.from_length_bounds(min_word_length, max_word_length,
+                                                                   max_edit_distance,
+                                                                   min_letter_ratio=None,
+                                                                   max_repeated_characters=None,
+                                                                   pattern=None)
+
+    def _init_symspell(self):
+        # Initialize a symspell index, as an alternative to the tries
+
+        if self.verbose:
+            print("\n", "=== Initializing SymSpellIndex ===")
+
+        self.symspell_index = SymSpellIndex(self.lexicon, max_distance=self.max_edit_distance)
 
     def _init_ranker(self, use_ranker):
 
@@ -135,45 +416,102 @@ class SpellChecker:
             raise ValueError("Unknown ranker specified ({}), choose from: {}".format(
                 use_ranker, KNOWN_RANKERS))
 
+        self.use_ranker = use_ranker
+
         if use_ranker == "noisy":
-            self.ranker = NoisyRanker()
+            self.ranker = NoisyRanker(token_frequencies=self.token_freq_dict,
+                                      phonetic_codes=self.phonetic_codes)
         elif use_ranker == "embedding":
             self.ranker = EmbeddingRanker()
 
-    # Public add_vocab method, also re-initializes the tries
+    def _init_caches(self, misspelling_cache_size, candidate_cache_size):
+        # Least recently used caches for whether a token is a misspelling, and for the candidates of
+        # a misspelling. Since token frequencies are very skewed, most lookups will be cache hits.
+
+        self.misspelling_cache_size = misspelling_cache_size
+        self.candidate_cache_size = candidate_cache_size
+
+        self._misspelling_cache = functools.lru_cache(
+            maxsize=misspelling_cache_size)(self._is_misspelling_uncached)
+
+        self._candidate_cache = functools.lru_cache(
+            maxsize=candidate_cache_size)(self._search_matches_uncached)
+
+    def skip_info(self):
+        """ Returns the number of tokens for which no candidates were searched, for each reason """
+
+        return self.garbage_filter.skip_info()
+
+    def cache_info(self):
+        """ Returns the hits, misses, maxsize and currsize of the misspelling and candidate caches """
+
+        return {'misspellings': self._misspelling_cache.cache_info(),
+                'candidates': self._candidate_cache.cache_info()}
+
+    def clear_caches(self):
+        """ Empties the misspelling, candidate and compound caches, and resets their statistics """
+
+        self._misspelling_cache.cache_clear()
+        self._candidate_cache.cache_clear()
+        self.compound_splitter.clear_cache()
+
     def add_vocab(self, vocabulary_list):
+        """
+        Add words to the lexicon. Only non-empty words that are a single token are added, after
+        lowercasing and remapping special characters, as for the lexicon files. The tries (or
+        the symspell index), phonetic codes and compound splitter are updated incrementally, in
+        time proportional to the number of words added, and the caches are emptied.
 
-        self._add_vocab(vocabulary_list)
-        self._init_tries()
+        Arguments:
+            vocabulary_list (list) - The words to add
+        """
 
-# Determine whether a token is a valid compound token,
-# for instance behandelplanbespreking = behandelplan + bespreking
-    def _is_compound_token(self, token):
+        words = [word for word in dict.fromkeys(self._lexicon_builder.lexicon_words(vocabulary_list,
+                                                                                     use_cache=False))
+                 if word not in self.lexicon]
 
-        for i in range(1, len(token)):
+        # The lexicon is updated as the prefix index of the compound splitter
+        self._update_indices(words, add=True)
 
-            # Split into a left and right part
-            left = token[0:i]
-            right = token[i:len(token)]
+    def remove_vocab(self, vocabulary_list):
+        """
+        Remove words from the lexicon, after lowercasing and remapping special characters. The
+        tries (or the symspell index), phonetic codes and compound splitter are updated
+        incrementally, and the caches are emptied.
 
-            # Accept if both parts are in the lexicon and at least 3 characters long
-            if len(left) >= 3 and len(right) >= 3 and left in self.lexicon and right in self.lexicon:
-                return (left, right)
+        Arguments:
+            vocabulary_list (list) - The words to remove
+        """
 
-    # Determine whether a token is a valid compound token separated by a 's' or a '-',
-    # for instance weekend-verlof = weekend + verlof
-    def _is_compound_infix_token(self, token):
+        words = [word for word in dict.fromkeys(unidecode.unidecode(word.lower())
+                                                for word in vocabulary_list)
+                 if word in self.lexicon]
 
-        # Iterate over possible splits
-        for m in re.finditer("[s-]+", token):
+        # The lexicon is updated as the prefix index of the compound splitter
+        self._update_indices(words, add=False)
 
-            # Split into left and right part
-            left = token[0:m.start()]
-            right = token[m.end():len(token)]
+    def _update_indices(self, words, add):
+        # Add words to or remove words from all indices of the lexicon
 
-            # Accept if both parts are in the lexicon and at least 3 characters long
-            if len(left) >= 3 and len(right) >= 3 and left in self.lexicon and right in self.lexicon:
-                return(left, right)
+        if self.candidate_generator == "symspell":
+            search_index = self.symspell_index
+        else:
+            search_index = self.match_trie
+
+        indices = [search_index, self.phonetic_codes, self.compound_splitter, self.garbage_filter]
+
+        for index in indices:
+            if add:
+                index.add_words(words)
+            else:
+                index.remove_words(words)
+
+        # The snapshot this spell checker was loaded from no longer has the same lexicon, so that
+        # correct_parallel writes a new one
+        self._snapshot_path = None
+
+        # Cached verdicts and candidates may have changed
+        self.clear_caches()
 
     def _contains_numeric(self, token):
         if re.search(r"\d", token):
@@ -182,6 +520,9 @@ class SpellChecker:
             return False
 
     def _is_misspelling(self, token):
+        return self._misspelling_cache(token)
+
+    def _is_misspelling_uncached(self, token):
 
         if self._contains_numeric(token):
             return False
@@ -189,44 +530,110 @@ class SpellChecker:
         if token in self.lexicon:
             return False
 
-        if self._is_compound_token(token) or self._is_compound_infix_token(token):
+        # Compounds of words in the lexicon, for instance behandelplanbespreking = behandelplan +
+        # bespreking, or weekend-verlof = weekend + verlof
+        if self.compound_splitter.split(token) is not None:
             return False
 
         # Other cases are misspellings
         return True
 
     # Search all matches for a word in the lexicon with edit_distance <= max_cost
-    def _search_matches(self, word, max_edit_distance=2):
+    # Tokens that are skipped by the garbage filter have no candidates
+    def _search_matches(self, word, max_edit_distance=None, max_candidates=None):
+
+        if self.garbage_filter.skip(word):
+            return []
+
+        return self._candidate_cache(word, max_edit_distance, max_candidates)
+
+    def _search_matches_uncached(self, word, max_edit_distance, max_candidates):
+
+        # Determine max_cost and the number of candidates
+        if max_edit_distance is None:
+            max_edit_distance = self.max_edit_distance
+
+        if max_candidates is None:
+            max_candidates = self.max_candidates
 
-        # Determine max_cost
         if len(word) <= 3:
-            max_edit_distance = 1
+            max_edit_distance = min(max_edit_distance, 1)
 
-        # Find the appropriate trie
-        if self.many_texts:
-            search_trie = self.match_tries[len(word)]
+        # Find the appropriate trie or index
+        if self.candidate_generator == "symspell":
+            search_trie = self.symspell_index
         else:
             search_trie = self.match_trie
 
-        # Return matches
-        return search_trie.search_matches(word, max_edit_distance)
+        # Find matches, or only the best max_candidates matches
+        if max_candidates is not None:
+            matches = search_trie.search_matches(word,
+                                                 max_edit_distance,
+                                                 top_k=max_candidates,
+                                                 priority=self._candidate_priority)
+        else:
+            matches = search_trie.search_matches(word, max_edit_distance)
+
+        if self.phonetic_candidates:
+            matches = self._add_phonetic_matches(word, matches, max_candidates)
+
+        return matches
+
+    # Priority of a candidate when only the best max_candidates matches are searched
+    def _candidate_priority(self, word):
+        return self.token_freq_dict.get(word, 1)
+
+    # Add words from the lexicon that sound the same as the word (i.e. have the same double metaphone
+    # code), and have edit_distance <= phonetic_max_edit_distance
+    def _add_phonetic_matches(self, word, matches, max_candidates):
+
+        code = doublemetaphone(word)[0]
+
+        if len(code) == 0:
+            return matches
+
+        found_words = set(match for (match, _) in matches)
+
+        candidates = [candidate for candidate in self.phonetic_codes.words_with_code(code)
+                      if candidate not in found_words]
+
+        distances = edit_distances(word, candidates, self.phonetic_max_edit_distance)
+
+        phonetic_matches = [(candidate, distance) for (candidate, distance) in zip(candidates, distances)
+                            if distance <= self.phonetic_max_edit_distance]
+
+        if len(phonetic_matches) == 0:
+            return matches
+
+        matches = matches + phonetic_matches
+
+        # Same order as the trie search
+        if max_candidates is None:
+            matches.sort()
+        else:
+            matches.sort(key=lambda match: (match[1], -self._candidate_priority(match[0]), match[0]))
+            matches = matches[:max_candidates]
+
+        return matches
 
     # Find misspellings in text
-    # returns [(misspelling:str, start_idx:int, end_idx:int, context:[str])]
+    # returns [(misspelling:str, start_idx:int, end_idx:int, context:ContextWindow)]
     def find_misspellings(self, text, context_window=10):
 
-        misspelling_tuples = []
+        return self._find_misspellings_in_doc(self.tokenize(text), context_window)
 
-        doc = self.tokenize(text)
+    # Find misspellings in a text that is already tokenized
+    def _find_misspellings_in_doc(self, doc, context_window=10):
+
+        misspelling_tuples = []
 
         for token in doc:
 
             # If token is a misspelling
             if self._is_misspelling(token.text.lower()):
 
-                # Extract context
-                context = [token_sub.text for token_sub in doc[max(
-                    token.i - context_window, 0):token.i + context_window]]
+                # A view of the context, the token texts are only copied if the ranker reads them
+                context = ContextWindow(doc, max(token.i - context_window, 0), token.i + context_window)
 
                 # Append to tuples
                 misspelling_tuples.append(
@@ -236,27 +643,240 @@ class SpellChecker:
 
     # Select most appropriate correction based on the ranker
     # returns [(misspelling:str, start_idx:int, end_idx:int, best_correction:str)]
-    def find_corrections(self, text):
+    def find_corrections(self, text, budget_ms=None, return_degradations=False):
+        """
+        Find the misspellings in a text and their best corrections.
+
+        Arguments:
+            text (str) - The text
+            budget_ms (float) - If given, the time (in milliseconds) within which the corrections
+                should be found. When the budget runs low, cheaper searches are used for the
+                remaining misspellings, see _search_within_budget.
+            return_degradations (bool) - Whether to also return the degradations that were applied
+
+        Returns:
+            [(misspelling:str, start_idx:int, end_idx:int, best_correction:str)], and if
+            return_degradations is set, a dictionary with the number of misspellings for each
+            degradation ('reduced_edit_distance', 'reduced_candidates' and 'skipped')
+        """
+
+        if budget_ms is None:
+            correction_tuples = self._rank_misspellings(self.find_misspellings(text))
+            degradations = {degradation: 0 for degradation in BUDGET_DEGRADATIONS}
+        else:
+            deadline = time.perf_counter() + budget_ms / 1000
+            correction_tuples, degradations = self._rank_misspellings_within_budget(
+                self.find_misspellings(text), budget_ms, deadline)
 
-        correction_tuples = []
+        if return_degradations:
+            return correction_tuples, degradations
 
-        for (misspelled_word, start_idx, end_idx, context) in self.find_misspellings(text):
+        return correction_tuples
 
-            best_correction = self.ranker.best_candidate(misspelled_word,
-                                                         self._search_matches(
-                                                             misspelled_word),
-                                                         context)
+    # Rank the candidates of all misspellings in a text at once
+    def _rank_misspellings(self, misspelling_tuples, candidates_per_misspelling=None):
 
-            # Append to tuples
-            correction_tuples.append(
-                (misspelled_word, start_idx, end_idx, best_correction))
+        if candidates_per_misspelling is None:
+            candidates_per_misspelling = [self._search_matches(misspelled_word)
+                                          for (misspelled_word, _, _, _) in misspelling_tuples]
 
-        return correction_tuples
+        best_corrections = self.ranker.best_candidates(
+            [(misspelled_word, candidates, context)
+             for ((misspelled_word, _, _, context), candidates)
+             in zip(misspelling_tuples, candidates_per_misspelling)])
+
+        # Return as tuples
+        return [(misspelled_word, start_idx, end_idx, best_correction)
+                for ((misspelled_word, start_idx, end_idx, _), best_correction)
+                in zip(misspelling_tuples, best_corrections)]
+
+    # Rank the misspellings of a text, searching the candidates of each misspelling with the
+    # remaining part of the budget
+    def _rank_misspellings_within_budget(self, misspelling_tuples, budget_ms, deadline):
+
+        degradations = {degradation: 0 for degradation in BUDGET_DEGRADATIONS}
+        candidates_per_misspelling = []
+
+        for (misspelled_word, _, _, _) in misspelling_tuples:
+
+            remaining = (deadline - time.perf_counter()) * 1000 / budget_ms if budget_ms > 0 else 0
+            candidates, degradation = self._search_within_budget(misspelled_word, remaining)
+
+            candidates_per_misspelling.append(candidates)
+
+            if degradation is not None:
+                degradations[degradation] += 1
+
+        return self._rank_misspellings(misspelling_tuples, candidates_per_misspelling), degradations
+
+    # Search the candidates of a misspelling, given the remaining fraction of the budget:
+    # - more than half: the normal search
+    # - more than a quarter: only candidates at edit distance 1 ('reduced_edit_distance')
+    # - more than nothing: also only the BUDGET_MAX_CANDIDATES best ('reduced_candidates')
+    # - nothing: no candidates, so the misspelling is not corrected ('skipped')
+    # returns (candidates, degradation), where degradation is None if the normal search was used
+    def _search_within_budget(self, word, remaining):
+
+        if remaining > 0.5 or (self.max_edit_distance <= 1 and remaining > 0.25):
+            return self._search_matches(word), None
+
+        if remaining > 0.25:
+            return self._search_matches(word, 1), 'reduced_edit_distance'
+
+        if remaining > 0:
+            max_candidates = BUDGET_MAX_CANDIDATES
+
+            if self.max_candidates is not None:
+                max_candidates = min(max_candidates, self.max_candidates)
+
+            return self._search_matches(word, min(self.max_edit_distance, 1), max_candidates), \
+                'reduced_candidates'
+
+        return [], 'skipped'
+
+    # Select most appropriate corrections for many texts, processed in batches
+    # returns [[(misspelling:str, start_idx:int, end_idx:int, best_correction:str)]], one list per text
+    def find_corrections_many(self, texts, batch_size=1000):
+
+        corrections_per_text = []
+
+        batch = []
+
+        for text in texts:
+
+            batch.append(text)
+
+            if len(batch) == batch_size:
+                corrections_per_text.extend(self._find_corrections_batch(batch))
+                batch = []
+
+        if len(batch) > 0:
+            corrections_per_text.extend(self._find_corrections_batch(batch))
+
+        return corrections_per_text
+
+    def _find_corrections_batch(self, texts):
+
+        # Tokenize all texts at once, and find misspellings
+        misspellings_per_text = [self._find_misspellings_in_doc(doc)
+                                 for doc in self.tokenize_many(texts, batch_size=len(texts))]
+
+        # If the ranker uses the context, rank all misspellings of a text at once
+        if self.ranker.uses_context:
+            return [self._rank_misspellings(misspelling_tuples)
+                    for misspelling_tuples in misspellings_per_text]
+
+        # Otherwise each unique misspelling is only searched and ranked once
+        best_corrections = {}
+
+        for misspelling_tuples in misspellings_per_text:
+            for (misspelled_word, _, _, context) in misspelling_tuples:
+
+                if misspelled_word not in best_corrections:
+                    best_corrections[misspelled_word] = self.ranker.best_candidate(
+                        misspelled_word, self._search_matches(misspelled_word), context)
+
+        return [[(misspelled_word, start_idx, end_idx, best_corrections[misspelled_word])
+                 for (misspelled_word, start_idx, end_idx, _) in misspelling_tuples]
+                for misspelling_tuples in misspellings_per_text]
 
     # Find misspellings, corrections and replace them in the text
-    def correct(self, text):
+    # If a budget_ms is given, see find_corrections
+    def correct(self, text, budget_ms=None, return_degradations=False):
+
+        correction_tuples, degradations = self.find_corrections(text, budget_ms, return_degradations=True)
+        corrected_text = self._apply_corrections(text, correction_tuples)
+
+        if return_degradations:
+            return corrected_text, degradations
+
+        return corrected_text
+
+    # Find misspellings, corrections and replace them in many texts, processed in batches
+    def correct_many(self, texts, batch_size=1000):
+
+        texts = list(texts)
+
+        return [self._apply_corrections(text, correction_tuples)
+                for text, correction_tuples in zip(texts, self.find_corrections_many(texts, batch_size))]
+
+    # Find misspellings, corrections and replace them in many texts, using multiple processes
+    def correct_parallel(self, texts, n_workers=None, batch_size=1000):
+        """
+        Correct many texts in parallel, using n_workers processes (by default the number of
+        cpus). Each process corrects batches of texts using correct_many.
+
+        The lexicon, token frequencies and tries are not copied to each process. If the
+        platform supports forking, the processes use the memory of this SpellChecker. Otherwise,
+        the processes memory-map a snapshot: the one this SpellChecker was initialized from (if no
+        vocabulary was added or removed since), or else a temporary snapshot that is written first.
+
+        Arguments:
+            texts (iterable) - The texts to be corrected
+            n_workers (int) - The number of processes
+            batch_size (int) - The number of texts that a process corrects at once
+
+        Returns:
+            The corrected texts, in the same order
+        """
+
+        global _worker_spell_checker
+
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+
+        texts = list(texts)
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+        if n_workers <= 1 or len(batches) <= 1:
+            return self.correct_many(texts, batch_size)
+
+        n_workers = min(n_workers, len(batches))
+
+        # Forked processes share the memory pages of this process until they are written to,
+        # freezing the garbage collector prevents it from writing to all objects
+        if 'fork' in multiprocessing.get_all_start_methods():
+
+            _worker_spell_checker = self
+            gc.freeze()
+
+            try:
+                with multiprocessing.get_context('fork').Pool(n_workers) as pool:
+                    corrected_batches = pool.map(_correct_batch, batches, chunksize=1)
+            finally:
+                _worker_spell_checker = None
+                gc.unfreeze()
+
+        # Otherwise, the processes memory-map the same snapshot
+        else:
+
+            worker_settings = {'use_ranker': self.use_ranker,
+                               'candidate_generator': self.candidate_generator,
+                               'max_candidates': self.max_candidates,
+                               'max_edit_distance': self.max_edit_distance,
+                               'phonetic_candidates': self.phonetic_candidates,
+                               'phonetic_max_edit_distance': self.phonetic_max_edit_distance,
+                               'max_compound_parts': self.max_compound_parts,
+                               'skip_garbage': self.skip_garbage,
+                               'misspelling_cache_size': self.misspelling_cache_size,
+                               'candidate_cache_size': self.candidate_cache_size}
+
+            with tempfile.TemporaryDirectory() as temp_dir:
+
+                snapshot_path = self._snapshot_path
+
+                if snapshot_path is None:
+                    snapshot_path = os.path.join(temp_dir, 'spellchecker.snapshot')
+                    self.save_snapshot(snapshot_path)
 
-        correction_tuples = self.find_corrections(text)
+                with multiprocessing.Pool(n_workers,
+                                          initializer=_init_worker,
+                                          initargs=(snapshot_path, self.spacy_model, worker_settings)) as pool:
+                    corrected_batches = pool.map(_correct_batch, batches, chunksize=1)
+
+        return [text for corrected_batch in corrected_batches for text in corrected_batch]
+
+    def _apply_corrections(self, text, correction_tuples):
 
         # sort from last to first
         # so that indexes keep matching when replacing multiple misspellings
@@ -269,3 +889,66 @@ class SpellChecker:
                 text = text[0:start_idx] + correction + text[end_idx:]
 
         return text
+
+
+class ContextWindow(collections.abc.Sequence):
+    """
+    A read-only view of the texts of the tokens doc[start:end], the context of a misspelling. The
+    texts are only copied from the doc when the view is read (for instance by the EmbeddingRanker),
+    and then only once. Compares equal to a list of the same texts.
+    """
+
+    __slots__ = ['_doc', '_start', '_end', '_texts']
+
+    def __init__(self, doc, start, end):
+        self._doc = doc
+        self._start = start
+        self._end = min(end, len(doc))
+        self._texts = None
+
+    def _materialize(self):
+        if self._texts is None:
+            self._texts = [token.text for token in self._doc[self._start:self._end]]
+
+        return self._texts
+
+    def __getitem__(self, index):
+        return self._materialize()[index]
+
+    def __len__(self):
+        return self._end - self._start
+
+    def __iter__(self):
+        return iter(self._materialize())
+
+    def __eq__(self, other):
+        if isinstance(other, collections.abc.Sequence) and not isinstance(other, str):
+            return self._materialize() == list(other)
+
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self._materialize())
+
+
+def _init_worker(snapshot_path, spacy_model, worker_settings):
+    """ Initialize the SpellChecker of a worker process of SpellChecker.correct_parallel """
+
+    global _worker_spell_checker
+
+    _worker_spell_checker = SpellChecker.from_snapshot(snapshot_path, spacy_model, **worker_settings)
+
+
+def _correct_batch(texts):
+    """ Correct a batch of texts in a worker process of SpellChecker.correct_parallel """
+
+    return _worker_spell_checker.correct_many(texts, batch_size=len(texts))
+
+
+def _sections_with_prefix(sections, prefix):
+    """ Select the snapshot sections that start with prefix, and strip the prefix """
+
+    return {name[len(prefix):]: buffer for name, buffer in sections.items()
+            if name.startswith(prefix)}
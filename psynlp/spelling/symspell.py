@@ -0,0 +1,137 @@
+"""
+This module contains functionality for the SymSpellIndex class.
+Based on the Symmetric Delete spelling correction algorithm by Wolf Garbe:
+https://github.com/wolfgarbe/SymSpell
+"""
+
+from itertools import chain
+
+from psynlp.spelling.editdistance import edit_distances
+from psynlp.spelling.editdisttrie import _sort_matches
+
+
+class SymSpellIndex:
+    """
+    A SymSpellIndex is an alternative to the EditDistTrie for looking up all matches with
+    edit_dist <= max_cost in a lexicon. It precomputes all strings that can be obtained by
+    deleting up to max_distance characters from the first prefix_length characters of each
+    word. A query then only needs to look up the deletions of its own prefix.
+
+    If two words are within edit distance d, then their prefixes share a string that can be
+    obtained by at most d deletions from each, so no matches are missed. Candidates found in
+    the index are verified using the full edit distance.
+    """
+
+    def __init__(self, lexicon, max_distance=2, prefix_length=7):
+        """
+        Initialize using the lexicon.
+
+        Arguments:
+            lexicon (iterable) - The words in the lexicon
+            max_distance (int) - The largest max_cost that can be used when searching
+            prefix_length (int) - The number of characters of each word used for the deletions
+        """
+
+        if prefix_length <= max_distance:
+            raise ValueError("prefix_length should be larger than max_distance")
+
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+
+        # Words sharing a prefix also share their deletions, so these are only stored once
+        self._words_by_prefix = {}
+
+        for word in lexicon:
+            self._words_by_prefix.setdefault(word[:prefix_length], []).append(word)
+
+        self._deletes = {}
+
+        for prefix in self._words_by_prefix:
+            for delete in self._generate_deletes(prefix, max_distance):
+                self._deletes.setdefault(delete, []).append(prefix)
+
+    def add_words(self, words):
+        """ Add words to the index, only the deletions of new prefixes are generated """
+
+        for word in words:
+
+            prefix = word[:self.prefix_length]
+
+            if prefix not in self._words_by_prefix:
+
+                self._words_by_prefix[prefix] = []
+
+                for delete in self._generate_deletes(prefix, self.max_distance):
+                    self._deletes.setdefault(delete, []).append(prefix)
+
+            if word not in self._words_by_prefix[prefix]:
+                self._words_by_prefix[prefix].append(word)
+
+    def remove_words(self, words):
+        """ Remove words from the index, and the deletions of prefixes that no longer occur """
+
+        for word in words:
+
+            prefix = word[:self.prefix_length]
+
+            if word not in self._words_by_prefix.get(prefix, ()):
+                continue
+
+            self._words_by_prefix[prefix].remove(word)
+
+            if len(self._words_by_prefix[prefix]) > 0:
+                continue
+
+            del self._words_by_prefix[prefix]
+
+            for delete in self._generate_deletes(prefix, self.max_distance):
+
+                self._deletes[delete].remove(prefix)
+
+                if len(self._deletes[delete]) == 0:
+                    del self._deletes[delete]
+
+    def _generate_deletes(self, word, max_distance):
+        """ All strings that can be obtained by deleting at most max_distance characters """
+
+        deletes = {word}
+        previous_deletes = {word}
+
+        for _ in range(max_distance):
+
+            previous_deletes = {delete[:i] + delete[i + 1:]
+                                for delete in previous_deletes
+                                for i in range(len(delete))}
+
+            deletes |= previous_deletes
+
+        return deletes
+
+    def search_matches(self, word, max_cost=2, top_k=None, priority=None):
+        """
+        Returns a list of all words that are less than the given maximum distance from the
+        target word, as [(word:str, edit_distance:int)]
+
+        If top_k is given, only the top_k best matches are returned, in the same order as
+        EditDistTrie.search_matches.
+        """
+
+        if max_cost > self.max_distance:
+            raise ValueError("max_cost ({}) exceeds the max_distance of the index ({})".format(
+                max_cost, self.max_distance))
+
+        prefixes = set()
+
+        for delete in self._generate_deletes(word[:self.prefix_length], max_cost):
+            prefixes.update(self._deletes.get(delete, ()))
+
+        candidates = list(chain.from_iterable(self._words_by_prefix[prefix] for prefix in prefixes))
+
+        # Verify the candidates using the full edit distance
+        results = [(candidate, distance)
+                   for (candidate, distance) in zip(candidates, edit_distances(word, candidates, max_cost))
+                   if distance <= max_cost]
+
+        # Same order as the EditDistTrie
+        return _sort_matches(results, top_k, priority)
+